@@ -31,3 +31,20 @@ register(
         'depth_limit': 2
     }
 )
+
+register(
+    id='RPS3VectorGame-v0',
+    entry_point='rps3env.envs:RPS3VectorEnv',
+    kwargs={
+        'num_envs': 16
+    }
+)
+
+register(
+    id='RPS3VectorGame-v1',
+    entry_point='rps3env.envs:RPS3VectorMinMaxEnv',
+    kwargs={
+        'num_envs': 16,
+        'depth_limit': 2
+    }
+)
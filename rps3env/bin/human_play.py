@@ -27,7 +27,8 @@ from pyglet.window import mouse, key
 # noinspection PyUnresolvedReferences
 import rps3env
 from rps3env import envs, config
-from rps3env.envs.rps3_game import BOARD_POSITIONS, l2i
+from rps3env.envs.rps3_game import BOARD_POSITIONS
+from rps3env.topology import LABEL_INDEX
 
 __author__ = 'Islam Elnabarawy'
 
@@ -82,8 +83,8 @@ def within_radius(x_1, y_1, x_2, y_2):
 
 def draw_move(move_from, move_to, color):
     offset = np.array((BOARD_OFFSET_X, BOARD_OFFSET_Y))
-    p1 = np.array(BOARD_POSITIONS[l2i(move_from)]) + offset
-    p2 = np.array(BOARD_POSITIONS[l2i(move_to)]) + offset
+    p1 = np.array(BOARD_POSITIONS[LABEL_INDEX[move_from]]) + offset
+    p2 = np.array(BOARD_POSITIONS[LABEL_INDEX[move_to]]) + offset
     direction = (p2 - p1) / norm(p2 - p1)
     p1 = p1 + direction * SELECTION_RADIUS
     p2 = p2 - direction * SELECTION_RADIUS
@@ -39,13 +39,14 @@ def main():
 
     env.seed(args.random_seed)
     env.reset()
+    rng = random.Random(args.random_seed)
 
-    action = random.choice(env.available_actions)
+    action = rng.choice(env.available_actions)
     obs, reward, done, info = env.step(action)
 
     while not done:
         env.render()
-        action = random.choice(env.available_actions)
+        action = rng.choice(env.available_actions)
         obs, reward, done, info = env.step(action)
 
     env.render()
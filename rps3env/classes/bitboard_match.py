@@ -0,0 +1,267 @@
+"""
+   Copyright 2019 Islam Elnabarawy
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+from rps3env import zobrist
+from rps3env.classes.board_data import BoardPiece, PieceType, PlayerColor
+from rps3env.topology import CENTER_BIT, NEIGHBORS, NEIGHBOR_MASKS
+
+__author__ = 'Islam Elnabarawy'
+
+
+def _subsets(mask):
+    subset = mask
+    while True:
+        yield subset
+        if subset == 0:
+            return
+        subset = (subset - 1) & mask
+
+
+# for every cell, the moves available from it keyed by which of its neighbors are occupied by the mover
+_CELL_MOVES = tuple(
+    {own: tuple((i, x) for x in n if not own & (1 << x)) for own in _subsets(NEIGHBOR_MASKS[i])}
+    for i, n in enumerate(NEIGHBORS)
+)
+
+# indexed by PieceType value: the type each piece beats, and the type that beats it
+_BEATS = (None, PieceType.S.value, PieceType.R.value, PieceType.P.value)
+_COUNTERS = (None, PieceType.P.value, PieceType.S.value, PieceType.R.value)
+
+_PIECE_TYPES = (None, PieceType.R, PieceType.P, PieceType.S)
+_COLORS = (PlayerColor.Blue, PlayerColor.Red)
+
+
+class BitboardMatch(object):
+    """
+    Drop-in replacement for Match that keeps the board as integer bitmasks over the 28 cells: one
+    occupancy mask per player color, one mask per piece type, and one mask of revealed pieces.
+    """
+
+    def __init__(self) -> None:
+        self._colors = [0, 0]
+        self._types = [0, 0, 0, 0]
+        self._revealed = 0
+        self._round = [-1, -1]
+        self._moves = []
+        self._game_over = False
+        self._hash = 0
+        self._undo_stack = []
+
+    @property
+    def board(self):
+        """
+        A list of BoardPiece objects built from the bitmasks. Changing these pieces does not change the match.
+        """
+        return [self.get_piece(i) for i in range(28)]
+
+    @property
+    def moves(self):
+        return self._moves
+
+    @property
+    def game_over(self):
+        return self._game_over
+
+    @property
+    def zobrist_hash(self) -> int:
+        """
+        64-bit Zobrist key of the pieces, their revealed flags, and the player to move, the same as Match's
+        """
+        return self._hash
+
+    def piece_counts(self, color: PlayerColor):
+        """
+        :return: The number of R, P and S pieces the given player still has on the board
+        """
+        own = self._colors[color.value]
+        return tuple(bin(own & self._types[t]).count('1') for t in range(1, 4))
+
+    def bitmasks(self):
+        """
+        :return: The Blue, Red, R, P, S and revealed cell masks, in that order
+        """
+        return (self._colors[0], self._colors[1], self._types[1], self._types[2], self._types[3],
+                self._revealed)
+
+    def color_at(self, index):
+        bit = 1 << index
+        if self._colors[0] & bit:
+            return PlayerColor.Blue
+        if self._colors[1] & bit:
+            return PlayerColor.Red
+        return None
+
+    def get_piece(self, index):
+        """
+        :return: A new BoardPiece for the piece at index, or None if the cell is empty
+        """
+        bit = 1 << index
+        if self._colors[0] & bit:
+            color = PlayerColor.Blue
+        elif self._colors[1] & bit:
+            color = PlayerColor.Red
+        else:
+            return None
+        return BoardPiece(_PIECE_TYPES[self._type_at(bit)], color, bool(self._revealed & bit))
+
+    def _type_at(self, bit):
+        if self._types[1] & bit:
+            return 1
+        if self._types[2] & bit:
+            return 2
+        return 3
+
+    def _cell_key(self, index):
+        bit = 1 << index
+        if self._colors[0] & bit:
+            color = 0
+        elif self._colors[1] & bit:
+            color = 1
+        else:
+            return 0
+        return zobrist.MATCH_PIECES[index][color][self._type_at(bit)][1 if self._revealed & bit else 0]
+
+    def set_board(self, pieces: list, color: PlayerColor):
+        assert self._round[color.value] < 0
+        assert isinstance(pieces, list) and len(pieces) == 9
+        assert pieces.count(PieceType.R.value) == \
+               pieces.count(PieceType.P.value) == \
+               pieces.count(PieceType.S.value) == 3
+
+        offset = 9 * color.value
+        for i, v in enumerate(pieces):
+            bit = 1 << (i + offset)
+            self._colors[color.value] |= bit
+            self._types[v] |= bit
+            self._hash ^= zobrist.MATCH_PIECES[i + offset][color.value][v][0]
+
+        self._round[color.value] += 1
+        self._moves.append((pieces, color))
+
+    def make_move(self, move_from: int, move_to: int, color: PlayerColor):
+        player = 1 if color is PlayerColor.Red else 0
+        assert not self._game_over
+        assert self._round[player] >= 0 and self._round[1 - player] >= 0
+        assert self._round[player] < self._round[1 - player] or \
+               (player == 0 and self._round[player] == self._round[1 - player])
+        assert 0 <= move_from < 28 and NEIGHBOR_MASKS[move_from] & (1 << move_to)
+
+        colors = self._colors
+        types = self._types
+        bit_from = 1 << move_from
+        bit_to = 1 << move_to
+
+        assert colors[player] & bit_from
+        assert not colors[player] & bit_to
+
+        from_type = self._type_at(bit_from)
+        to_type = None
+        self._hash ^= self._cell_key(move_from) ^ self._cell_key(move_to)
+
+        if not colors[1 - player] & bit_to:
+            # this is a move action, just swap the piece across
+            colors[player] ^= bit_from | bit_to
+            types[from_type] ^= bit_from | bit_to
+            if self._revealed & bit_from:
+                self._revealed ^= bit_from | bit_to
+            result = 0
+        else:
+            to_type = self._type_at(bit_to)
+
+            # both pieces get revealed regardless of the outcome
+            self._revealed |= bit_from | bit_to
+
+            if to_type == from_type:
+                result = 0
+            elif to_type == _BEATS[from_type]:
+                # challenge won, move the piece across
+                colors[1 - player] ^= bit_to
+                types[to_type] ^= bit_to
+                colors[player] ^= bit_from | bit_to
+                types[from_type] ^= bit_from | bit_to
+                self._revealed &= ~bit_from
+                result = 1
+            else:
+                # challenge lost, challenger gets destroyed
+                colors[player] ^= bit_from
+                types[from_type] ^= bit_from
+                self._revealed &= ~bit_from
+                result = -1
+
+        self._hash ^= self._cell_key(move_from) ^ self._cell_key(move_to) ^ zobrist.SIDE_TO_MOVE
+
+        # check game-over conditions
+        if (colors[0] | colors[1]) & CENTER_BIT:
+            center_color = 0 if colors[0] & CENTER_BIT else 1
+            if not types[_COUNTERS[self._type_at(CENTER_BIT)]] & colors[1 - center_color]:
+                result += 100 if center_color == player else -100
+                self._game_over = True
+
+        if not self._game_over and not colors[player]:
+            result -= 100
+            self._game_over = True
+
+        if not self._game_over and not colors[1 - player]:
+            result += 100
+            self._game_over = True
+
+        self._round[player] += 1
+        self._moves.append((move_from, move_to, color))
+
+        return result, _PIECE_TYPES[to_type] if to_type is not None else None
+
+    def push_move(self, move_from: int, move_to: int):
+        """
+        Make a move for the player whose turn it is, and remember enough to take it back with pop_move().
+        """
+        undo = (self._colors[0], self._colors[1], self._types[1], self._types[2], self._types[3],
+                self._revealed, self._game_over, self._hash)
+        result = self.make_move(move_from, move_to, _COLORS[0 if self._round[0] <= self._round[1] else 1])
+        self._undo_stack.append(undo)
+        return result
+
+    def pop_move(self):
+        """
+        Take back the last move made with push_move(), restoring the bitmasks in place.
+        """
+        self._colors[0], self._colors[1], self._types[1], self._types[2], self._types[3], \
+            self._revealed, self._game_over, self._hash = self._undo_stack.pop()
+        color = self._moves.pop()[2]
+        self._round[1 if color is PlayerColor.Red else 0] -= 1
+
+    def clone(self):
+        other = BitboardMatch()
+        other._colors = self._colors[:]
+        other._types = self._types[:]
+        other._revealed = self._revealed
+        other._round = self._round[:]
+        other._moves = self._moves[:]
+        other._game_over = self._game_over
+        other._hash = self._hash
+        return other
+
+    def get_possible_moves(self):
+        assert self._round[0] >= 0 and self._round[1] >= 0
+        player = 0 if self._round[0] <= self._round[1] else 1
+        own = self._colors[player]
+        moves = []
+        bits = own
+        while bits:
+            low = bits & -bits
+            i = low.bit_length() - 1
+            moves += _CELL_MOVES[i][own & NEIGHBOR_MASKS[i]]
+            bits ^= low
+        return _COLORS[player], moves
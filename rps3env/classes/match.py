@@ -14,6 +14,7 @@
    limitations under the License.
 """
 
+from rps3env import topology, zobrist
 from rps3env.classes import BoardPiece, PieceType, PlayerColor
 
 __author__ = 'Islam Elnabarawy'
@@ -26,6 +27,9 @@ class Match(object):
         self._round = [-1, -1]
         self._moves = []
         self._game_over = False
+        self._counts = [[0] * 3, [0] * 3]
+        self._hash = 0
+        self._undo_stack = []
 
     @property
     def board(self):
@@ -39,6 +43,26 @@ class Match(object):
     def game_over(self):
         return self._game_over
 
+    @property
+    def zobrist_hash(self) -> int:
+        """
+        64-bit Zobrist key of the pieces, their revealed flags, and the player to move
+        """
+        return self._hash
+
+    def piece_counts(self, color: PlayerColor):
+        """
+        :return: The number of R, P and S pieces the given player still has on the board
+        """
+        return tuple(self._counts[color.value])
+
+    def get_piece(self, index):
+        return self._board[index]
+
+    def color_at(self, index):
+        piece = self._board[index]
+        return piece.color if piece is not None else None
+
     def set_board(self, pieces: list, color: PlayerColor):
         assert self._round[color.value] < 0
         assert isinstance(pieces, list) and len(pieces) == 9
@@ -47,7 +71,10 @@ class Match(object):
                pieces.count(PieceType.S.value) == 3
 
         for i, v in enumerate(pieces):
-            self._board[i + (9 * color.value)] = BoardPiece(PieceType(v), color)
+            index = i + (9 * color.value)
+            self._board[index] = BoardPiece(PieceType(v), color)
+            self._hash ^= _piece_key(index, self._board[index])
+        self._counts[color.value] = [3, 3, 3]
 
         self._round[color.value] += 1
         self._moves.append((pieces, color))
@@ -57,13 +84,15 @@ class Match(object):
         assert self._round[color.value] >= 0 and self._round[1 - color.value] >= 0
         assert self._round[color.value] < self._round[1 - color.value] or \
                (color == PlayerColor.Blue and self._round[color.value] == self._round[1 - color.value])
-        assert move_to in valid_locations(move_from)
+        assert move_to in topology.NEIGHBORS[move_from]
 
         from_piece = self._board[move_from]  # type: BoardPiece
         to_piece = self._board[move_to]  # type: BoardPiece
 
         assert from_piece is not None and from_piece.color == color
 
+        self._hash ^= _piece_key(move_from, from_piece) ^ _piece_key(move_to, to_piece)
+
         if to_piece is None:
             # this is a move action, just swap the piece across
             self._board[move_from], self._board[move_to] = None, from_piece
@@ -80,25 +109,30 @@ class Match(object):
             elif to_piece.piece_type == [PieceType.S, PieceType.R, PieceType.P][from_piece.piece_type.value - 1]:
                 # challenge won, move the piece across
                 self._board[move_from], self._board[move_to] = None, from_piece
+                self._counts[to_piece.color.value][to_piece.piece_type.value - 1] -= 1
                 result = 1
             else:
                 # challenge lost, challenger gets destroyed
                 self._board[move_from] = None
+                self._counts[color.value][from_piece.piece_type.value - 1] -= 1
                 result = -1
 
+        self._hash ^= _piece_key(move_from, self._board[move_from]) ^ _piece_key(move_to, self._board[move_to]) \
+            ^ zobrist.SIDE_TO_MOVE
+
         # check game-over conditions
         center_piece = self._board[27]
         if center_piece is not None:
-            other_pieces = [p.piece_type for p in self._board if p is not None and p.color != center_piece.color]
-            if other_pieces.count([PieceType.P, PieceType.S, PieceType.R][center_piece.piece_type.value - 1]) == 0:
+            # the opponent's pieces that can beat the center piece are the next type along R -> P -> S
+            if self._counts[1 - center_piece.color.value][center_piece.piece_type.value % 3] == 0:
                 result += 100 if center_piece.color == color else -100
                 self._game_over = True
 
-        if not self._game_over and len([p for p in self._board if p is not None and p.color == color]) == 0:
+        if not self._game_over and sum(self._counts[color.value]) == 0:
             result -= 100
             self._game_over = True
 
-        if not self._game_over and len([p for p in self._board if p is not None and p.color != color]) == 0:
+        if not self._game_over and sum(self._counts[1 - color.value]) == 0:
             result += 100
             self._game_over = True
 
@@ -107,29 +141,72 @@ class Match(object):
 
         return result, (to_piece.piece_type if to_piece is not None else None)
 
+    def push_move(self, move_from: int, move_to: int):
+        """
+        Make a move for the player whose turn it is, and remember enough to take it back with pop_move().
+        """
+        from_piece = self._board[move_from]  # type: BoardPiece
+        to_piece = self._board[move_to]  # type: BoardPiece
+        undo = (
+            move_from, move_to, from_piece, to_piece,
+            from_piece is not None and from_piece.revealed, to_piece is not None and to_piece.revealed,
+            self._game_over, self._hash
+        )
+        result = self.make_move(move_from, move_to, self._get_turn())
+        self._undo_stack.append(undo)
+        return result
+
+    def pop_move(self):
+        """
+        Take back the last move made with push_move(), restoring the board in place.
+        """
+        move_from, move_to, from_piece, to_piece, from_revealed, to_revealed, game_over, zobrist_hash = \
+            self._undo_stack.pop()
+        if to_piece is not None:
+            # give the captured piece back to its owner, if there was one
+            if self._board[move_to] is from_piece:
+                self._counts[to_piece.color.value][to_piece.piece_type.value - 1] += 1
+            elif self._board[move_from] is None:
+                self._counts[from_piece.color.value][from_piece.piece_type.value - 1] += 1
+        from_piece.revealed = from_revealed
+        if to_piece is not None:
+            to_piece.revealed = to_revealed
+        self._board[move_from] = from_piece
+        self._board[move_to] = to_piece
+        color = self._moves.pop()[2]
+        self._round[color.value] -= 1
+        self._game_over = game_over
+        self._hash = zobrist_hash
+
     def clone(self):
         other = Match()
         other._board = [BoardPiece(x.piece_type, x.color, x.revealed) if x is not None else None for x in self._board]
         other._round = self._round[:]
         other._moves = self._moves[:]
+        other._counts = [self._counts[0][:], self._counts[1][:]]
+        other._hash = self._hash
         return other
 
+    def _get_turn(self):
+        return PlayerColor.Blue if self._round[0] <= self._round[1] else PlayerColor.Red
+
     def get_possible_moves(self):
         assert self._round[0] >= 0 and self._round[1] >= 0
-        color = PlayerColor.Blue if self._round[0] <= self._round[1] else PlayerColor.Red
+        color = self._get_turn()
         moves = []
         for i, p in enumerate(self._board):
             if p is not None and p.color == color:
                 moves.extend(
-                    (i, x) for x in valid_locations(i) if self._board[x] is None or self._board[x].color != color
+                    (i, x) for x in topology.NEIGHBORS[i] if self._board[x] is None or self._board[x].color != color
                 )
         return color, moves
 
 
+def _piece_key(index, piece: BoardPiece):
+    if piece is None:
+        return 0
+    return zobrist.MATCH_PIECES[index][piece.color.value][piece.piece_type.value][piece.revealed]
+
+
 def valid_locations(index):
-    if index < 18:
-        return [(index + 1) % 18, (index + 17) % 18, 18 + index // 2]
-    index -= 18
-    if index < 9:
-        return [18 + (index + 1) % 9, 18 + (index + 8) % 9, index * 2, index * 2 + 1, 27]
-    return [18 + i for i in range(9)]
+    return list(topology.NEIGHBORS[index])
@@ -14,6 +14,8 @@
    limitations under the License.
 """
 from rps3env.envs.rps3_game import RPS3GameEnv, RPS3GameMinMaxEnv
+from rps3env.envs.rps3_vector import RPS3VectorEnv, RPS3VectorMinMaxEnv
+from rps3env.envs.rps3_subproc_vector import RPS3SubprocVectorEnv
 
 __author__ = 'Islam Elnabarawy'
 
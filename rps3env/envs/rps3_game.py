@@ -15,22 +15,23 @@
 """
 import itertools
 import logging
+import numbers
 import random
-import sys
 from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 
 import gym
+import numpy as np
 from gym import spaces
 
 import rps3env.config
-from rps3env import opponents
-from rps3env.classes import PieceType, PlayerColor, Match, BoardPiece
+from rps3env import opponents, seeding, topology
+from rps3env.classes import PieceType, PlayerColor, Match, BitboardMatch, BoardPiece
 
 __author__ = 'Islam Elnabarawy'
 
 logger = logging.getLogger(__name__)
 logger.setLevel(rps3env.config.ENV_LOG_LEVEL)
-logger.addHandler(logging.StreamHandler(sys.stdout))
 
 BOARD_TEMPLATE = """
                 {13}
@@ -54,19 +55,11 @@ BOARD_POSITIONS = [
 
 
 def i2l(i):
-    if i < 18:
-        return 'O{}'.format(i)
-    if i < 27:
-        return 'I{}'.format(i - 18)
-    return 'C0'
+    return topology.LABELS[i]
 
 
 def l2i(l):
-    if l[0] == 'O':
-        return int(l[1:])
-    if l[0] == 'I':
-        return 18 + int(l[1:])
-    return 27
+    return topology.LABEL_INDEX[l]
 
 
 def action_to_move(action):
@@ -77,11 +70,125 @@ def move_to_action(move):
     return tuple(l2i(l) for l in move)
 
 
+NUM_SETUP_LAYOUTS = 1680
+
+# the sections of the flat int8 observation used with array_obs=True, in order
+ARRAY_OBS_FIELDS = (
+    ('occupied', 28),
+    ('player_owned', 28),
+    ('piece_type', 28),
+    ('player_captures', 3),
+    ('opponent_captures', 3),
+)
+ARRAY_OBS_SIZE = sum(size for name, size in ARRAY_OBS_FIELDS)
+
+_setup_layouts = None
+_setup_layout_index = None
+
+
+def get_setup_layouts():
+    """
+    All the distinct ways of placing three R, three P and three S pieces, built once on first use.
+
+    :return: A sorted tuple of NUM_SETUP_LAYOUTS layouts, each a tuple of 9 PieceType values
+    """
+    global _setup_layouts, _setup_layout_index
+    if _setup_layouts is None:
+        layouts = []
+        for rocks in itertools.combinations(range(9), 3):
+            for papers in itertools.combinations([i for i in range(9) if i not in rocks], 3):
+                layouts.append(tuple(
+                    PieceType.R.value if i in rocks else PieceType.P.value if i in papers else PieceType.S.value
+                    for i in range(9)
+                ))
+        _setup_layouts = tuple(sorted(layouts))
+        _setup_layout_index = {layout: i for i, layout in enumerate(_setup_layouts)}
+    return _setup_layouts
+
+
+def action_to_layout(action):
+    return list(get_setup_layouts()[action])
+
+
+def layout_to_action(layout):
+    get_setup_layouts()
+    return _setup_layout_index[tuple(layout)]
+
+
+def edge_to_action(edge):
+    return topology.EDGES[edge]
+
+
+def action_to_edge(action):
+    return topology.EDGE_INDEX[tuple(action)]
+
+
+def get_move_outcome(match, move, result, player, other_piece):
+    """
+    Work out how a move that was just made on the match looks to the opponents.
+
+    :param player: True if the move was made by the player (Blue), False if by the opponent (Red)
+    :return: The outcome code ('M', 'T', 'W' or 'L'), and the PieceType of the player's piece in the challenge, which
+        is the other hand from the opponent's point of view, or None if the move was not a challenge
+    """
+    if result == 0:
+        if match.get_piece(move[0]) is None:
+            return 'M', None  # this was a move action
+        return 'T', other_piece  # it was a tie
+    outcome = 'W' if result > 0 else 'L'
+    to_type = match.get_piece(move[1]).piece_type
+    if (result > 0) == player:
+        # the player's piece won, so it is the one left on the board
+        return outcome, to_type
+    # the player's piece lost, so it is the type that loses to the one left on the board
+    return outcome, PieceType((to_type.value + 1) % 3 + 1)
+
+
+def get_move_data(match, move, result, player, other_piece):
+    """
+    Describe a move that was just made on the match the way the opponents expect it in apply_move().
+    """
+    outcome, other_hand = get_move_outcome(match, move, result, player, other_piece)
+    move_data = {'from': i2l(move[0]), 'to': i2l(move[1]), 'outcome': outcome}
+    if other_hand is not None:
+        move_data['otherHand'] = other_hand.name
+    return move_data
+
+
 class RPS3GameEnv(gym.Env):
     metadata = {'render.modes': [None, 'human', 'console', 'ansi', 'rgb_array']}
 
-    def __init__(self) -> None:
+    def __init__(self, bitboard=False, discrete_setup=False, array_obs=False, discrete_moves=False,
+                 opponent_service=None) -> None:
+        """
+        :param bitboard: Run the match on a BitboardMatch instead of a Match
+        :param discrete_setup: Take the setup action as a Discrete(NUM_SETUP_LAYOUTS) layout index
+        :param discrete_moves: Take moves as a Discrete(NUM_EDGES) index into rps3env.topology.EDGES
+        :param array_obs: Return observations as one flat int8 array of ARRAY_OBS_SIZE values instead of a dict of
+            lists. The same array is updated in place on every step, so copy it if it needs to outlive the next step.
+        :param opponent_service: An rps3env.opponents.OpponentService to get the opponent's moves from, which can be
+            shared with other environments. step_async() then hands the opponent's move to the service, and
+            step_wait() waits for it.
+        """
         super().__init__()
+        self._bitboard = bitboard
+        self._opponent_service = opponent_service
+        self._pending_step = None
+        self._discrete_setup = discrete_setup
+        self._discrete_moves = discrete_moves
+        self._obs_buffer = None
+        self._obs_views = None
+        self._setup_mask = np.ones(NUM_SETUP_LAYOUTS, dtype=np.bool_)
+        self._move_mask = np.zeros(topology.NUM_EDGES, dtype=np.bool_)
+        self._mask_changes = None  # type: list
+        if array_obs:
+            self._obs_buffer = np.zeros(ARRAY_OBS_SIZE, dtype=np.int8)
+            self._obs_views = OrderedDict()
+            offset = 0
+            for name, size in ARRAY_OBS_FIELDS:
+                self._obs_views[name] = self._obs_buffer[offset:offset + size]
+                offset += size
+        self._rng = random.Random()
         self._match = None  # type: Match
         self._round = None  # type: int
         self._player_won = None  # type: bool
@@ -98,7 +205,18 @@ class RPS3GameEnv(gym.Env):
         return self._action_space
 
     @property
-    def observation_space(self) -> spaces.Dict:
+    def observation_views(self):
+        """
+        With array_obs=True, an OrderedDict of named views into the flat observation array, otherwise None.
+        """
+        return self._obs_views
+
+    @property
+    def observation_space(self) -> gym.Space:
+        if self._observation_space is None and self._obs_buffer is not None:
+            low = [0] * 56 + [PieceType.N.value] * 28 + [0] * 6
+            high = [1] * 56 + [PieceType.S.value] * 28 + [3] * 6
+            self._observation_space = spaces.Box(np.array(low), np.array(high), dtype=np.int8)
         if self._observation_space is None:
             self._observation_space = spaces.Dict([
                 ('occupied', spaces.MultiBinary(28)),
@@ -121,42 +239,81 @@ class RPS3GameEnv(gym.Env):
             raise ValueError("The environment has not been initialized. Please call reset() first.")
         if self._match.game_over:
             raise ValueError("The current episode is over. Please call reset() to start a new episode.")
-        actions = []
-        if self._action_space.shape[0] == 9:
+        if self._round < 0:
             # board setup phase
-            actions.extend(list(x) for x in itertools.permutations([1, 2, 3] * 3))
+            if self._discrete_setup:
+                actions = list(range(NUM_SETUP_LAYOUTS))
+            else:
+                actions = [list(x) for x in get_setup_layouts()]
         else:
             # game phase
             color, actions = self._match.get_possible_moves()
+            if self._discrete_moves:
+                actions = [topology.EDGE_INDEX[move] for move in actions]
         return actions
 
+    def action_mask(self):
+        """
+        The legal actions as a boolean array: over the NUM_SETUP_LAYOUTS layouts (see get_setup_layouts()) in the
+        setup phase, and over the moves in rps3env.topology.EDGES after that. The array is kept and updated in place
+        from the cells each step changed, so copy it if it needs to outlive the next step.
+        """
+        if self._match is None:
+            raise ValueError("The environment has not been initialized. Please call reset() first.")
+        if self._match.game_over:
+            raise ValueError("The current episode is over. Please call reset() to start a new episode.")
+        if self._round < 0:
+            return self._setup_mask
+        color_at = self._match.color_at
+        if self._mask_changes is None:
+            edges = range(topology.NUM_EDGES)
+        else:
+            edges = {k for i in self._mask_changes for k in topology.EDGES_FROM[i] + topology.EDGES_TO[i]}
+        for k in edges:
+            move_from, move_to = topology.EDGES[k]
+            self._move_mask[k] = color_at(move_from) is PlayerColor.Blue and color_at(move_to) is not PlayerColor.Blue
+        self._mask_changes = []
+        return self._move_mask
+
     def seed(self, seed=None):
-        if seed is None:
-            # generate the seed the same way random.seed() does internally
-            try:
-                from os import urandom as _urandom
-                seed = int.from_bytes(_urandom(2500), 'big')
-            except NotImplementedError:  # pragma: no cover
-                import time
-                seed = int(time.time() * 256)
-        random.seed(seed)
+        # reseed in place, since the opponent shares this generator
+        seed = seeding.create_seed(seed)
+        self._rng.seed(seed)
         return seed
 
     def step(self, action):
+        self.step_async(action)
+        return self.step_wait()
+
+    def step_async(self, action):
+        """
+        Make the player's move and ask for the opponent's answer, which step_wait() then waits for. With an opponent
+        service, the caller can start steps in many environments before waiting for any of them.
+        """
         if self._match is None:
             raise ValueError("The environment has not been initialized. Please call reset() first.")
+        assert self._pending_step is None, "step_wait() has to be called before the next step_async()"
         reward = [0, 0]
         player_move = None
-        opponent_move = None
+        changed = None
+        opponent_to_move = False
         if self._round < 0:
+            if isinstance(action, numbers.Integral):
+                action = action_to_layout(action)
             assert isinstance(action, list) and len(action) == 9
             self._match.set_board(action, PlayerColor.Blue)
             layout = self._get_opponent_layout()
             self._match.set_board(list(map(lambda v: v.value, layout)), PlayerColor.Red)
-            self._action_space = spaces.MultiDiscrete([27, 27])
+            if self._discrete_moves:
+                self._action_space = spaces.Discrete(topology.NUM_EDGES)
+            else:
+                self._action_space = spaces.MultiDiscrete([27, 27])
         else:
+            if isinstance(action, numbers.Integral):
+                action = edge_to_action(action)
             assert isinstance(action, tuple) and len(action) == 2
             player_move = action_to_move(action)
+            changed = list(action)
             move_reward, other_piece = self._match.make_move(action[0], action[1], PlayerColor.Blue)
             reward[0] = move_reward
 
@@ -166,31 +323,55 @@ class RPS3GameEnv(gym.Env):
             else:
                 # tell opponent about the move's result
                 self._opponent_apply_move(action, move_reward, player=True, other_piece=other_piece)
+                opponent_to_move = True
+        future = None
+        if opponent_to_move and self._opponent_service is not None:
+            future = self._opponent_service.submit(self._opponent)
+        self._pending_step = reward, player_move, changed, opponent_to_move, future
+
+    def step_wait(self):
+        assert self._pending_step is not None, "step_wait() called without a matching step_async()"
+        reward, player_move, changed, opponent_to_move, future = self._pending_step
+        self._pending_step = None
+        opponent_move = None
+        if opponent_to_move:
+            # make a move for the opponent
+            opponent_action = self._get_opponent_move(future)
+            opponent_move = [i2l(i) for i in opponent_action]
+            changed.extend(opponent_action)
+            move_reward, other_piece = self._match.make_move(opponent_action[0], opponent_action[1],
+                                                             PlayerColor.Red)
+            reward[1] = -move_reward
 
-                # make a move for the opponent
-                opponent_move = self._get_opponent_move()
-                opponent_action = move_to_action(opponent_move)
-                move_reward, other_piece = self._match.make_move(opponent_action[0], opponent_action[1],
-                                                                 PlayerColor.Red)
-                reward[1] = -move_reward
-
-                # check for game over condition
-                if self._match.game_over:
-                    self._player_won = reward[1] < 0
-                else:
-                    # tell opponent about the move's result
-                    self._opponent_apply_move(opponent_action, move_reward, player=False, other_piece=other_piece)
+            # check for game over condition
+            if self._match.game_over:
+                self._player_won = reward[1] < 0
+            else:
+                # tell opponent about the move's result
+                self._opponent_apply_move(opponent_action, move_reward, player=False, other_piece=other_piece)
 
+        if changed is None:
+            self._mask_changes = None
+        elif self._mask_changes is not None:
+            self._mask_changes.extend(changed)
         self._round += 1
         info = {'round': self._round, 'player_move': player_move, 'opponent_move': opponent_move}
-        return self._get_observation(), reward, self._match.game_over, info
+        if opponent_to_move:
+            # SearchStats of the opponent's move, for opponents that search
+            info['search_stats'] = getattr(self._opponent, 'last_search_stats', None)
+        return self._get_observation(changed), reward, self._match.game_over, info
 
     def reset(self):
-        self._match = Match()
+        if self._pending_step is not None:
+            self.step_wait()
+        self._match = BitboardMatch() if self._bitboard else Match()
         self._init_opponent()
         self._round = -1
         self._player_won = False
-        self._action_space = spaces.MultiDiscrete([3] * 9)
+        if self._discrete_setup:
+            self._action_space = spaces.Discrete(NUM_SETUP_LAYOUTS)
+        else:
+            self._action_space = spaces.MultiDiscrete([3] * 9)
         return self._get_observation()
 
     def close(self):
@@ -198,7 +379,7 @@ class RPS3GameEnv(gym.Env):
         super().close()
 
     def _init_opponent(self):
-        self._opponent = opponents.RandomOpponent()
+        self._opponent = opponents.RandomOpponent(rng=self._rng)
 
     def render(self, mode='human', close=False):
         if mode not in self.metadata['render.modes']:
@@ -227,67 +408,68 @@ class RPS3GameEnv(gym.Env):
         output += self._opponent.print_board(output=False)
         return output
 
-    def _get_observation(self):
+    def _get_observation(self, changed=None):
+        """
+        :param changed: The cells the last step changed, or None if any of them might have
+        """
+        if self._obs_buffer is not None:
+            return self._get_array_observation(changed)
+        board = self._match.board
         obs = OrderedDict([
-            ('occupied', [p is not None for p in self._match.board]),
-            ('player_owned', [p is not None and p.color == PlayerColor.Blue for p in self._match.board]),
+            ('occupied', [p is not None for p in board]),
+            ('player_owned', [p is not None and p.color == PlayerColor.Blue for p in board]),
             ('piece_type', [
                 PieceType.N.value if p is None else
                 (p.piece_type.value if p.color == PlayerColor.Blue or p.revealed else PieceType.U.value)
-                for p in self._match.board
+                for p in board
             ]),
             ('player_captures', [0, 0, 0]),
             ('opponent_captures', [0, 0, 0]),
         ])
         if self._round < 0:
             return obs
-        player_counts = [0, 0, 0]
-        opponent_counts = [0, 0, 0]
-        for p in [p for p in self._match.board if p is not None]:
-            if p.color == PlayerColor.Blue:
-                player_counts[p.piece_type.value - 1] += 1
-            else:
-                opponent_counts[p.piece_type.value - 1] += 1
-        obs['player_captures'] = [3 - x for x in player_counts]
-        obs['opponent_captures'] = [3 - x for x in opponent_counts]
+        obs['player_captures'] = [3 - x for x in self._match.piece_counts(PlayerColor.Blue)]
+        obs['opponent_captures'] = [3 - x for x in self._match.piece_counts(PlayerColor.Red)]
         return obs
 
+    def _get_array_observation(self, changed):
+        occupied = self._obs_views['occupied']
+        player_owned = self._obs_views['player_owned']
+        piece_type = self._obs_views['piece_type']
+        for i in range(28) if changed is None else changed:
+            p = self._match.get_piece(i)
+            if p is None:
+                occupied[i] = player_owned[i] = 0
+                piece_type[i] = PieceType.N.value
+            else:
+                owned = p.color == PlayerColor.Blue
+                occupied[i] = 1
+                player_owned[i] = owned
+                piece_type[i] = p.piece_type.value if owned or p.revealed else PieceType.U.value
+        if self._round < 0:
+            self._obs_views['player_captures'][:] = 0
+            self._obs_views['opponent_captures'][:] = 0
+        else:
+            self._obs_views['player_captures'][:] = [3 - x for x in self._match.piece_counts(PlayerColor.Blue)]
+            self._obs_views['opponent_captures'][:] = [3 - x for x in self._match.piece_counts(PlayerColor.Red)]
+        return self._obs_buffer
+
     def _get_opponent_layout(self):
         layout = self._opponent.init_board_layout(1)
         return [PieceType[s] for s in layout]
 
-    def _get_opponent_move(self):
-        opponent_move = self._opponent.get_next_move().split(':')
+    def _get_opponent_move(self, future=None):
+        if future is None:
+            opponent_move = self._opponent.next_move_idx()
+        else:
+            self._opponent_service.flush()
+            opponent_move = future.result()
         logger.debug("opponent move: %s", opponent_move)
         return opponent_move
 
     def _opponent_apply_move(self, move, result, player, other_piece):
-        move_from = move[0]
-        move_to = move[1]
-        from_piece = self._match.board[move_from]
-        to_piece = self._match.board[move_to]
-        move_data = {'from': i2l(move_from), 'to': i2l(move_to)}
-        if result == 0:
-            if from_piece is None:
-                move_data['outcome'] = 'M'  # this was a move action
-            else:
-                move_data['outcome'] = 'T'  # it was a tie
-                move_data['otherHand'] = other_piece.name
-        else:
-            if result > 0:
-                move_data['outcome'] = 'W'
-                if player:
-                    move_data['otherHand'] = to_piece.piece_type.name
-                else:
-                    move_data['otherHand'] = PieceType(((to_piece.piece_type.value + 1) % 3) + 1).name
-            else:
-                move_data['outcome'] = 'L'
-                if player:
-                    move_data['otherHand'] = PieceType(((to_piece.piece_type.value + 1) % 3) + 1).name
-                else:
-                    move_data['otherHand'] = to_piece.piece_type.name
-
-        self._opponent.apply_move(move_data)
+        outcome, other_hand = get_move_outcome(self._match, move, result, player, other_piece)
+        self._opponent.apply_move_idx(move[0], move[1], outcome, other_hand.value if other_hand is not None else None)
 
     def _render_viewer(self, return_rgb_array=False):
         import numpy as np
@@ -348,13 +530,31 @@ class RPS3GameEnv(gym.Env):
 
 
 class RPS3GameMinMaxEnv(RPS3GameEnv):
-    def __init__(self, **kwargs) -> None:
-        super().__init__()
+    def __init__(self, bitboard=False, discrete_setup=False, array_obs=False, discrete_moves=False,
+                 opponent_service=None, **kwargs) -> None:
+        super().__init__(bitboard=bitboard, discrete_setup=discrete_setup, array_obs=array_obs,
+                         discrete_moves=discrete_moves, opponent_service=opponent_service)
         self._opponent_kwargs = kwargs
+        self._search_pool = None
 
     @property
     def settings(self):
         return self._opponent_kwargs
 
     def _init_opponent(self):
-        self._opponent = opponents.MinMaxOpponent(**self._opponent_kwargs)
+        if self._opponent is not None:
+            self._opponent.close()
+        search_workers = self._opponent_kwargs.get('search_workers')
+        if self._search_pool is None and search_workers is not None and search_workers > 1:
+            # the worker processes of the parallel search are shared by every match the env plays
+            self._search_pool = ProcessPoolExecutor(search_workers)
+        self._opponent = opponents.MinMaxOpponent(rng=self._rng, search_pool=self._search_pool,
+                                                  **self._opponent_kwargs)
+
+    def close(self):
+        if self._opponent is not None:
+            self._opponent.close()
+        if self._search_pool is not None:
+            self._search_pool.shutdown()
+            self._search_pool = None
+        super().close()
@@ -0,0 +1,196 @@
+"""
+   Copyright 2019 Islam Elnabarawy
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+import ctypes
+import multiprocessing
+
+import gym
+import numpy as np
+from gym import spaces
+
+from rps3env import seeding, topology
+from rps3env.envs.rps3_vector import RPS3VectorMinMaxEnv
+
+__author__ = 'Islam Elnabarawy'
+
+# name, per-env shape and dtype of every buffer shared with the workers
+_BUFFERS = (
+    ('obs', (topology.NUM_CELLS,), np.int8),
+    ('rewards', (), np.float32),
+    ('dones', (), np.bool_),
+    ('masks', (topology.NUM_EDGES,), np.bool_),
+    ('actions', (), np.int64),
+)
+
+
+def _create_buffers(context, num_envs):
+    buffers = {}
+    for name, shape, dtype in _BUFFERS:
+        size = int(np.prod((num_envs,) + shape)) * np.dtype(dtype).itemsize
+        buffers[name] = context.RawArray(ctypes.c_byte, size)
+    return buffers
+
+
+def _attach_buffers(buffers, num_envs):
+    return {
+        name: np.frombuffer(buffers[name], dtype=dtype).reshape((num_envs,) + shape)
+        for name, shape, dtype in _BUFFERS
+    }
+
+
+def _worker(pipe, parent_pipe, buffers, num_envs, start, stop, env_class, env_kwargs):
+    parent_pipe.close()
+    arrays = _attach_buffers(buffers, num_envs)
+    env = env_class(stop - start, **env_kwargs)
+
+    def write(obs, rewards=None, dones=None):
+        arrays['obs'][start:stop] = obs
+        arrays['masks'][start:stop] = env.action_mask()
+        if rewards is not None:
+            arrays['rewards'][start:stop] = rewards
+            arrays['dones'][start:stop] = dones
+
+    try:
+        while True:
+            command, data = pipe.recv()
+            if command == 'step':
+                obs, rewards, dones, infos = env.step(arrays['actions'][start:stop])
+                write(obs, rewards, dones)
+                pipe.send(infos)
+            elif command == 'reset':
+                write(env.reset())
+                pipe.send(None)
+            elif command == 'seed':
+                pipe.send(env.seed(data))
+            elif command == 'close':
+                break
+            else:
+                raise ValueError(command)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        env.close()
+        pipe.close()
+
+
+class RPS3SubprocVectorEnv(gym.Env):
+    """
+    Splits num_envs matches over num_workers processes, each running a vector env class on its own slice.
+
+    Observations, rewards, dones, action masks and actions live in shared memory, so only the commands and the
+    info dicts travel over the pipes. The arrays returned by reset() and step_wait() are those shared buffers: they
+    are overwritten by the next step, so copy them if they need to outlive it.
+
+    step_async() returns as soon as the workers have their actions, so the caller can do other work while the
+    opponents search, and collect the results with step_wait().
+    """
+    metadata = {'render.modes': [None]}
+
+    def __init__(self, num_envs=16, num_workers=None, env_class=RPS3VectorMinMaxEnv, start_method=None,
+                 **env_kwargs) -> None:
+        super().__init__()
+        if num_workers is None:
+            num_workers = min(num_envs, multiprocessing.cpu_count())
+        assert 0 < num_workers <= num_envs
+        self._num_envs = num_envs
+        self._waiting = False
+        self._closed = False
+
+        context = multiprocessing.get_context(start_method)
+        buffers = _create_buffers(context, num_envs)
+        self._arrays = _attach_buffers(buffers, num_envs)
+
+        bounds = np.linspace(0, num_envs, num_workers + 1).astype(int).tolist()
+        self._pipes = []
+        self._processes = []
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            parent_pipe, child_pipe = context.Pipe()
+            process = context.Process(
+                target=_worker,
+                args=(child_pipe, parent_pipe, buffers, num_envs, start, stop, env_class, env_kwargs),
+                daemon=True
+            )
+            process.start()
+            child_pipe.close()
+            self._pipes.append(parent_pipe)
+            self._processes.append(process)
+
+        self.action_space = spaces.MultiDiscrete([topology.NUM_EDGES] * num_envs)
+        self.observation_space = spaces.Box(0, 7, (num_envs, topology.NUM_CELLS), np.int8)
+
+    @property
+    def num_envs(self):
+        return self._num_envs
+
+    @property
+    def num_workers(self):
+        return len(self._processes)
+
+    def action_mask(self):
+        return self._arrays['masks']
+
+    def seed(self, seed=None):
+        """
+        Seed every worker with its own seed derived from the given one.
+        """
+        seed = seeding.create_seed(seed)
+        for pipe, worker_seed in zip(self._pipes, seeding.fork_seeds(seed, self.num_workers)):
+            pipe.send(('seed', worker_seed))
+        return [worker_seed for pipe in self._pipes for worker_seed in pipe.recv()]
+
+    def reset(self):
+        self._assert_not_waiting()
+        for pipe in self._pipes:
+            pipe.send(('reset', None))
+        for pipe in self._pipes:
+            pipe.recv()
+        return self._arrays['obs']
+
+    def step_async(self, actions):
+        self._assert_not_waiting()
+        self._arrays['actions'][:] = actions
+        for pipe in self._pipes:
+            pipe.send(('step', None))
+        self._waiting = True
+
+    def step_wait(self):
+        assert self._waiting, "step_wait() called without a matching step_async()"
+        infos = []
+        for pipe in self._pipes:
+            infos.extend(pipe.recv())
+        self._waiting = False
+        return self._arrays['obs'], self._arrays['rewards'], self._arrays['dones'], infos
+
+    def step(self, actions):
+        self.step_async(actions)
+        return self.step_wait()
+
+    def close(self):
+        if self._closed:
+            return
+        if self._waiting:
+            self.step_wait()
+        for pipe in self._pipes:
+            pipe.send(('close', None))
+        for process in self._processes:
+            process.join()
+        for pipe in self._pipes:
+            pipe.close()
+        self._arrays.clear()
+        self._closed = True
+        super().close()
+
+    def _assert_not_waiting(self):
+        assert not self._waiting, "step_wait() has to be called before issuing another command"
@@ -0,0 +1,257 @@
+"""
+   Copyright 2019 Islam Elnabarawy
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+import gym
+import numpy as np
+from gym import spaces
+
+from rps3env import opponents, seeding, topology
+from rps3env.classes import BitboardMatch, PieceType, PlayerColor
+from rps3env.envs.rps3_game import NUM_SETUP_LAYOUTS, action_to_layout, get_move_outcome
+
+__author__ = 'Islam Elnabarawy'
+
+# Observation cell codes: 0 is an empty cell, 1-3 are the player's R, P and S pieces, 4 is an unrevealed opponent
+# piece, and 5-7 are the opponent's revealed R, P and S pieces.
+OBS_OPPONENT_UNKNOWN = 4
+
+_EDGE_FROM = np.array([a for a, b in topology.EDGES], dtype=np.intp)
+_EDGE_TO = np.array([b for a, b in topology.EDGES], dtype=np.intp)
+_CELL_SHIFTS = np.arange(topology.NUM_CELLS, dtype=np.int64)
+
+
+class RPS3VectorEnv(gym.Env):
+    """
+    Steps num_envs matches at once. The player is always Blue and the opponent answers each move within step().
+
+    Episodes skip the setup phase: on every reset the player's pieces are placed using the given layout, or a
+    random one of the 1680 distinct layouts if there is none. Finished matches are reset automatically, and the
+    observation returned for them is the first one of the next match; the final one is in info['terminal_observation'].
+
+    Observations, rewards, dones and action masks are written into preallocated arrays that step() and reset()
+    return directly, so copy them if they need to outlive the next call.
+
+    Actions are indices into rps3env.topology.EDGES, one per match.
+    """
+    metadata = {'render.modes': [None]}
+
+    def __init__(self, num_envs=16, layout=None, opponent_service=None) -> None:
+        """
+        :param opponent_service: An rps3env.opponents.OpponentService to get the moves of the opponent objects from
+        """
+        super().__init__()
+        self._num_envs = num_envs
+        self._layout = layout
+        self._opponent_service = opponent_service
+        self._np_random = np.random.default_rng()
+        self._opponent_rngs = [random.Random() for _ in range(num_envs)]
+        self._matches = [None] * num_envs  # type: list
+        self._opponents = [None] * num_envs  # type: list
+        self._rounds = [0] * num_envs
+        self._obs = np.zeros((num_envs, topology.NUM_CELLS), dtype=np.int8)
+        self._rewards = np.zeros(num_envs, dtype=np.float32)
+        self._dones = np.zeros(num_envs, dtype=np.bool_)
+        self._masks = np.zeros((num_envs, topology.NUM_EDGES), dtype=np.bool_)
+        self._bitmasks = np.zeros((num_envs, 6), dtype=np.int64)
+        self.action_space = spaces.MultiDiscrete([topology.NUM_EDGES] * num_envs)
+        self.observation_space = spaces.Box(0, 7, (num_envs, topology.NUM_CELLS), np.int8)
+
+    @property
+    def num_envs(self):
+        return self._num_envs
+
+    def action_mask(self):
+        """
+        A (num_envs, NUM_EDGES) boolean array with the player's legal moves in each match, laid out like
+        RPS3GameEnv.action_mask() in the movement phase.
+        """
+        return self._masks
+
+    def seed(self, seed=None):
+        """
+        Seed the layouts and the built-in opponent with seed, and every match's opponent object with its own seed
+        derived from it.
+        """
+        seed = seeding.create_seed(seed)
+        self._np_random = np.random.default_rng(seed)
+        for rng, opponent_seed in zip(self._opponent_rngs, seeding.fork_seeds(seed, self._num_envs)):
+            rng.seed(opponent_seed)
+        return [seed]
+
+    def reset(self):
+        for i in range(self._num_envs):
+            self._reset_match(i)
+        self._rewards[:] = 0
+        self._dones[:] = False
+        self._update_observations()
+        return self._obs
+
+    def step(self, actions):
+        """
+        :param actions: One edge index per match
+        :return: The observations, rewards, dones and a list of info dicts
+        """
+        if self._matches[0] is None:
+            raise ValueError("The environment has not been initialized. Please call reset() first.")
+        matches = self._matches
+        actions = np.asarray(actions).tolist()
+        rewards = [0] * self._num_envs
+        searching = []
+        waiting = []
+        waiting_masks = []
+        for i in range(self._num_envs):
+            match = matches[i]
+            move = topology.EDGES[actions[i]]
+            reward, other_piece = match.make_move(move[0], move[1], PlayerColor.Blue)
+            if not match.game_over:
+                if self._opponents[i] is not None:
+                    _apply_move_idx(self._opponents[i], match, move, reward, True, other_piece)
+                    searching.append(i)
+                else:
+                    waiting.append(i)
+                    waiting_masks.append(match.bitmasks()[1])
+            rewards[i] = reward
+
+        # the opponent objects all get asked for their moves before any of them is waited for
+        for i, (move_from, move_to) in zip(searching, self._opponent_moves(searching)):
+            rewards[i] -= self._opponent_turn(i, move_from, move_to)
+        searched = set(searching)
+
+        # the built-in random opponent picks its moves for all of its matches at once
+        if waiting:
+            red_moves = _random_moves(np.array(waiting_masks, dtype=np.int64), self._np_random).tolist()
+            for i, k in zip(waiting, red_moves):
+                move_from, move_to = topology.EDGES[k]
+                rewards[i] -= matches[i].make_move(move_from, move_to, PlayerColor.Red)[0]
+
+        infos = []
+        terminal = []
+        dones = [False] * self._num_envs
+        for i in range(self._num_envs):
+            match = matches[i]
+            self._rounds[i] += 1
+            info = {'round': self._rounds[i]}
+            if i in searched:
+                info['search_stats'] = getattr(self._opponents[i], 'last_search_stats', None)
+            if match.game_over:
+                dones[i] = True
+                terminal.append((info, match.bitmasks()))
+                self._reset_match(i)
+            infos.append(info)
+        self._rewards[:] = rewards
+        self._dones[:] = dones
+        self._update_observations()
+        if terminal:
+            final = _decode_observations(np.array([t[1] for t in terminal], dtype=np.int64))
+            for k, (info, _) in enumerate(terminal):
+                info['terminal_observation'] = final[k]
+        return self._obs, self._rewards, self._dones, infos
+
+    def _init_opponent(self, rng):
+        """
+        :param rng: The random.Random that belongs to the match
+        :return: The opponent object for a new match, or None to play uniformly random moves directly on the match
+        """
+        return None
+
+    def _reset_match(self, i):
+        match = BitboardMatch()
+        layout = self._layout if self._layout is not None else self._random_layout()
+        match.set_board(layout, PlayerColor.Blue)
+        opponent = self._init_opponent(self._opponent_rngs[i])
+        if opponent is None:
+            opponent_layout = self._random_layout()
+        else:
+            opponent_layout = [PieceType[s].value for s in opponent.init_board_layout(1)]
+        match.set_board(opponent_layout, PlayerColor.Red)
+        self._matches[i] = match
+        self._opponents[i] = opponent
+        self._rounds[i] = 0
+
+    def _random_layout(self):
+        return action_to_layout(self._np_random.integers(NUM_SETUP_LAYOUTS))
+
+    def _opponent_moves(self, indices):
+        if self._opponent_service is None:
+            return [self._opponents[i].next_move_idx() for i in indices]
+        futures = [self._opponent_service.submit(self._opponents[i]) for i in indices]
+        self._opponent_service.flush()
+        return [future.result() for future in futures]
+
+    def _opponent_turn(self, i, move_from, move_to):
+        match = self._matches[i]
+        opponent = self._opponents[i]
+        result, other_piece = match.make_move(move_from, move_to, PlayerColor.Red)
+        if not match.game_over:
+            _apply_move_idx(opponent, match, (move_from, move_to), result, False, other_piece)
+        return result
+
+    def _update_observations(self):
+        bitmasks = self._bitmasks
+        bitmasks[:] = [match.bitmasks() for match in self._matches]
+        self._obs[:] = _decode_observations(bitmasks)
+        _legal_moves(bitmasks[:, 0], out=self._masks)
+
+
+class RPS3VectorMinMaxEnv(RPS3VectorEnv):
+    def __init__(self, num_envs=16, layout=None, opponent_service=None, **kwargs) -> None:
+        super().__init__(num_envs=num_envs, layout=layout, opponent_service=opponent_service)
+        self._opponent_kwargs = kwargs
+        self._search_pool = None
+
+    @property
+    def settings(self):
+        return self._opponent_kwargs
+
+    def _init_opponent(self, rng):
+        search_workers = self._opponent_kwargs.get('search_workers')
+        if self._search_pool is None and search_workers is not None and search_workers > 1:
+            # the worker processes of the parallel search are shared by every match
+            self._search_pool = ProcessPoolExecutor(search_workers)
+        return opponents.MinMaxOpponent(rng=rng, search_pool=self._search_pool, **self._opponent_kwargs)
+
+    def close(self):
+        for opponent in self._opponents:
+            if opponent is not None:
+                opponent.close()
+        if self._search_pool is not None:
+            self._search_pool.shutdown()
+            self._search_pool = None
+        super().close()
+
+
+def _apply_move_idx(opponent, match, move, result, player, other_piece):
+    outcome, other_hand = get_move_outcome(match, move, result, player, other_piece)
+    opponent.apply_move_idx(move[0], move[1], outcome, other_hand.value if other_hand is not None else None)
+
+
+def _legal_moves(own, out=None):
+    occupied = ((own[:, None] >> _CELL_SHIFTS) & 1).astype(np.bool_)
+    return np.logical_and(occupied[:, _EDGE_FROM], ~occupied[:, _EDGE_TO], out=out)
+
+
+def _random_moves(own, rng):
+    # a player with pieces left always has a legal move, so the argmax always lands on one
+    return (rng.random((len(own), topology.NUM_EDGES)) * _legal_moves(own)).argmax(axis=1)
+
+
+def _decode_observations(bitmasks):
+    bits = (bitmasks[:, :, None] >> _CELL_SHIFTS) & 1
+    blue, red, rock, paper, scissors, revealed = (bits[:, k] for k in range(6))
+    piece_type = rock + 2 * paper + 3 * scissors
+    return (blue * piece_type + red * (OBS_OPPONENT_UNKNOWN + revealed * piece_type)).astype(np.int8)
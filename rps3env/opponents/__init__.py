@@ -1,9 +1,11 @@
 from rps3env.opponents.base_opponent import BaseOpponent
 from rps3env.opponents.minmax_opponent import MinMaxOpponent
 from rps3env.opponents.random_opponent import RandomOpponent
+from rps3env.opponents.opponent_service import OpponentService
 
 __all__ = [
     'BaseOpponent',
     'RandomOpponent',
-    'MinMaxOpponent'
+    'MinMaxOpponent',
+    'OpponentService'
 ]
@@ -15,8 +15,10 @@
 """
 from abc import ABCMeta
 from abc import abstractmethod
+import random
 
 from rps3env.opponents.match_state import MatchState
+from rps3env.topology import LABEL_INDEX, SQUARES
 
 __author__ = 'Islam Elnabarawy'
 
@@ -24,13 +26,23 @@ __author__ = 'Islam Elnabarawy'
 class BaseOpponent:
     __metaclass__ = ABCMeta
 
-    def __init__(self):
+    def __init__(self, rng=None):
+        """
+        :param rng: The random.Random to draw from, so that the opponent can share its environment's seed
+        """
         self._state = MatchState()
+        self._rng = rng if rng is not None else random.Random()
 
     @property
     def board(self):
         return self._state.board
 
+    def snapshot(self):
+        """
+        :return: A mutable copy of the board that can be changed and passed back to reset_board()
+        """
+        return self._state.snapshot()
+
     @property
     def captures(self):
         return self._state.captures
@@ -45,7 +57,7 @@ class BaseOpponent:
         return layout
 
     def init_board_layout(self, player_side=0, layout=None):
-        board = self._state.board
+        board = self._state.snapshot()
 
         index = 9 if player_side == 0 else 0
         board['O'][index:index + 9] = ['OU'] * 9
@@ -61,6 +73,15 @@ class BaseOpponent:
     def reset_board(self, board):
         self._state = MatchState(board)
 
+    def get_state(self):
+        """
+        :return: A copy of the opponent's MatchState
+        """
+        return self._state.clone()
+
+    def set_state(self, state):
+        self._state = state.clone()
+
     @abstractmethod
     def get_player_hand(self):
         hand = 'R'
@@ -81,6 +102,27 @@ class BaseOpponent:
             move['otherHand'] if 'otherHand' in move else None
         )
 
+    def apply_move_idx(self, move_from, move_to, outcome, other_type=None):
+        """
+        Same as apply_move(), with the cells given as indices 0-27 and the other hand as a PieceType value.
+        """
+        self._state.apply_move(
+            SQUARES[move_from],
+            SQUARES[move_to],
+            outcome,
+            MatchState.PIECE_TYPE_KEY[other_type] if other_type is not None else None
+        )
+
+    def next_move_idx(self):
+        """
+        Same as get_next_move(), but returns the move as a (from, to) tuple of cell indices 0-27.
+        """
+        move = self.get_next_move()
+        if move is None:
+            return None
+        move_from, move_to = move.split(':')
+        return LABEL_INDEX[move_from], LABEL_INDEX[move_to]
+
     def get_possible_moves(self, player):
         return ['%s%s:%s%s' % (move[0] + move[1])
                 for move in self._state.get_possible_moves(player)]
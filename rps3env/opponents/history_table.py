@@ -0,0 +1,72 @@
+"""
+   Copyright 2019 Islam Elnabarawy
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+from collections import OrderedDict
+
+__author__ = 'Islam Elnabarawy'
+
+
+class HistoryTable(object):
+    """
+    Move ordering counters for the MinMax search, keyed by MatchState.zobrist_hash.
+
+    Holds at most max_entries states, and when it is full the state that was used least recently gets evicted.
+    """
+
+    def __init__(self, max_entries=1 << 14) -> None:
+        """
+        :param max_entries: The number of states to keep counters for, or None for no limit
+        """
+        self.max_entries = max_entries
+        self.evictions = 0
+        self.probes = 0
+        self.hits = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def items(self):
+        return self._entries.items()
+
+    def get_scores(self, key):
+        """
+        :return: The dict of move counters for key, which is created if needed and marked as the most recently used
+        """
+        entries = self._entries
+        scores = entries.get(key)
+        self.probes += 1
+        if scores is None:
+            scores = entries[key] = {}
+            if self.max_entries is not None and len(entries) > self.max_entries:
+                entries.popitem(last=False)
+                self.evictions += 1
+        else:
+            self.hits += 1
+            entries.move_to_end(key)
+        return scores
+
+    def clear(self):
+        self._entries.clear()
+        self.evictions = 0
+        self.probes = 0
+        self.hits = 0
+
+    def stats(self):
+        return {'entries': len(self._entries), 'max_entries': self.max_entries, 'evictions': self.evictions,
+                'probes': self.probes, 'hits': self.hits}
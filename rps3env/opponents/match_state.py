@@ -13,14 +13,50 @@
    See the License for the specific language governing permissions and
    limitations under the License.
 """
-import copy
-import math
+from types import MappingProxyType
+
+from rps3env import zobrist
+from rps3env.topology import NEIGHBORS, RING_OFFSETS, SQUARE_INDEX, SQUARES
 
 __author__ = 'Islam Elnabarawy'
 
+# Each cell is stored as one byte: the low two bits are the piece's index in MatchState.PIECE_KEY, and the flags
+# below say who owns it and whether a player piece has been revealed. An empty cell is 0.
+TYPE_MASK = 0x03
+UNKNOWN = 0x03
+PLAYER = 0x04
+OPPONENT = 0x08
+REVEALED = 0x10
+
+# the counts are stored in the same buffer, right after the 28 cells
+_CAPTURES = 28
+_OPPONENT_COUNTS = 31
+_PLAYER_COUNTS = 35
+_PLAYER_REVEALS = 38
+_SIZE = 41
+
+_CODES = {'0': 0}
+for _index, _letter in enumerate('RPS'):
+    _CODES['P' + _letter] = PLAYER | _index
+    _CODES['P' + _letter + '!'] = PLAYER | REVEALED | _index
+for _index, _letter in enumerate('RPSU'):
+    _CODES['O' + _letter] = OPPONENT | _index
+
+# ring name, first cell and end cell of each ring
+_RINGS = (('O', 0, 18), ('I', 18, 27), ('C', 27, 28))
+
+_STRINGS = [None] * 32
+_PIECE_KEYS = [None] * 32
+for _piece, _code in _CODES.items():
+    _STRINGS[_code] = _piece
+    if _code:
+        _PIECE_KEYS[_code] = zobrist.STATE_PIECES[_piece]
+
 
 class MatchState:
     PIECE_KEY = ['R', 'P', 'S', 'U']
+    # piece letters indexed by PieceType value
+    PIECE_TYPE_KEY = ('U', 'R', 'P', 'S')
 
     STARTING_BOARD = {
         'O': [
@@ -33,207 +69,304 @@ class MatchState:
 
     def __init__(self, board=None, captures=None, opponent_counts=None,
                  player_counts=None, player_reveals=None, turns=0):
-        self._board = copy.deepcopy(board) \
-            if board is not None else copy.deepcopy(MatchState.STARTING_BOARD)
-        self._captures = captures \
-            if captures is not None else [0] * 3
-        self._opponent_counts = opponent_counts \
-            if opponent_counts is not None else [0] * 3 + [9]
-        self._player_counts = player_counts \
-            if player_counts is not None else [0] * 3
-        self._player_reveals = player_reveals \
-            if player_reveals is not None else [0] * 3
+        self._data = data = bytearray(_SIZE)
+        if board is not None:
+            for (ring, squares) in board.items():
+                offset = RING_OFFSETS[ring]
+                for (index, piece) in enumerate(squares):
+                    data[offset + index] = _CODES[piece]
+        data[_CAPTURES:_CAPTURES + 3] = bytes(captures if captures is not None else [0] * 3)
+        data[_OPPONENT_COUNTS:_OPPONENT_COUNTS + 4] = bytes(
+            opponent_counts if opponent_counts is not None else [0] * 3 + [9])
+        data[_PLAYER_COUNTS:_PLAYER_COUNTS + 3] = bytes(player_counts if player_counts is not None else [0] * 3)
+        data[_PLAYER_REVEALS:_PLAYER_REVEALS + 3] = bytes(
+            player_reveals if player_reveals is not None else [0] * 3)
         self._turns = turns
+        self._undo_stack = []
         if opponent_counts is None or player_counts is None or player_reveals is None:
             self._update_counts()
+        self._hash = self._compute_hash()
 
     def clone(self):
         """
         :rtype : MatchState
         :return: A cloned copy of this object
         """
-        return copy.deepcopy(self)
+        other = self.__class__.__new__(self.__class__)
+        other._data = self._data[:]
+        other._turns = self._turns
+        other._hash = self._hash
+        other._undo_stack = []
+        return other
+
+    def __getstate__(self):
+        # the undo records only mean something to the search that made them
+        return bytes(self._data), self._turns, self._hash
+
+    def __setstate__(self, state):
+        data, self._turns, self._hash = state
+        self._data = bytearray(data)
+        self._undo_stack = []
 
     def get_board_value(self, ring, index):
-        return self._board[ring][index]
+        return _STRINGS[self._data[RING_OFFSETS[ring] + index]]
 
     @property
     def board(self):
-        return copy.deepcopy(self._board)
+        """
+        A read-only view of the board, mapping each ring to a tuple of its cells. Use snapshot() for a mutable copy.
+        """
+        data = self._data
+        return MappingProxyType({ring: tuple([_STRINGS[piece] for piece in data[start:end]])
+                                 for ring, start, end in _RINGS})
+
+    def snapshot(self):
+        """
+        :return: A mutable copy of the board, mapping each ring to a list of its cells, as accepted by MatchState()
+        """
+        data = self._data
+        return {ring: [_STRINGS[piece] for piece in data[start:end]] for ring, start, end in _RINGS}
 
     @property
     def captures(self):
-        return copy.copy(self._captures)
+        return tuple(self._data[_CAPTURES:_CAPTURES + 3])
 
     @property
     def counts(self):
-        return copy.copy(self._opponent_counts)
+        return tuple(self._data[_OPPONENT_COUNTS:_OPPONENT_COUNTS + 4])
 
     @property
     def player_counts(self):
-        return copy.copy(self._player_counts)
+        return tuple(self._data[_PLAYER_COUNTS:_PLAYER_COUNTS + 3])
 
     @property
     def player_reveals(self):
-        return copy.copy(self._player_reveals)
+        return tuple(self._data[_PLAYER_REVEALS:_PLAYER_REVEALS + 3])
+
+    @property
+    def num_captures(self):
+        """
+        The number of opponent pieces captured so far, same as sum(captures)
+        """
+        data = self._data
+        return data[_CAPTURES] + data[_CAPTURES + 1] + data[_CAPTURES + 2]
+
+    @property
+    def num_unknown(self):
+        """
+        The number of opponent pieces that have not been revealed yet, same as counts[-1]
+        """
+        return self._data[_OPPONENT_COUNTS + UNKNOWN]
+
+    @property
+    def num_player_pieces(self):
+        """
+        The number of player pieces left on the board, same as sum(player_counts)
+        """
+        data = self._data
+        return data[_PLAYER_COUNTS] + data[_PLAYER_COUNTS + 1] + data[_PLAYER_COUNTS + 2]
 
     @property
     def turns(self):
         return self._turns
 
+    @property
+    def zobrist_hash(self) -> int:
+        """
+        64-bit Zobrist key of the board, the captures, and the player to move
+        """
+        return self._hash
+
+    def _compute_hash(self):
+        data = self._data
+        result = zobrist.SIDE_TO_MOVE if self._turns % 2 else 0
+        for cell in range(28):
+            if data[cell]:
+                result ^= _PIECE_KEYS[data[cell]][cell]
+        for index in range(3):
+            result ^= zobrist.STATE_CAPTURES[index][data[_CAPTURES + index]]
+        return result
+
+    def _set_cell(self, cell, value):
+        piece = self._data[cell]
+        if piece:
+            self._hash ^= _PIECE_KEYS[piece][cell]
+        if value:
+            self._hash ^= _PIECE_KEYS[value][cell]
+        self._data[cell] = value
+
+    def _add_capture(self, index):
+        count = self._data[_CAPTURES + index]
+        self._hash ^= zobrist.STATE_CAPTURES[index][count] ^ zobrist.STATE_CAPTURES[index][count + 1]
+        self._data[_CAPTURES + index] = count + 1
+
+    def _reveal_opponent(self, cell, other_index):
+        # an unknown opponent piece is now known, update the counts
+        self._set_cell(cell, OPPONENT | other_index)
+        self._data[_OPPONENT_COUNTS + other_index] += 1
+        self._data[_OPPONENT_COUNTS + UNKNOWN] -= 1
+
     def _update_counts(self):
-        self._opponent_counts = self._captures + [0]
-        self._player_counts = [0] * 3
-        for (ring, squares) in self._board.items():
-            for (index, piece) in enumerate(squares):
-                if piece[0] == 'O':
-                    self._opponent_counts[self.PIECE_KEY.index(piece[1])] += 1
-                elif piece[0] == 'P':
-                    self._player_counts[self.PIECE_KEY.index(piece[1])] += 1
-                    if len(piece) > 2:
-                        self._player_reveals[self.PIECE_KEY.index(piece[1])] += 1
+        data = self._data
+        data[_OPPONENT_COUNTS:_OPPONENT_COUNTS + 4] = data[_CAPTURES:_CAPTURES + 3] + b'\0'
+        data[_PLAYER_COUNTS:_PLAYER_COUNTS + 3] = bytes(3)
+        for piece in data[:28]:
+            if piece & OPPONENT:
+                data[_OPPONENT_COUNTS + (piece & TYPE_MASK)] += 1
+            elif piece & PLAYER:
+                data[_PLAYER_COUNTS + (piece & TYPE_MASK)] += 1
+                if piece & REVEALED:
+                    data[_PLAYER_REVEALS + (piece & TYPE_MASK)] += 1
 
     def apply_move(self, move_from, move_to, outcome, other_hand=None):
         self._turns += 1
-        from_ring, from_index = move_from
-        to_ring, to_index = move_to
-        from_piece = self._board[from_ring][from_index]
-        to_piece = self._board[to_ring][to_index]
+        self._hash ^= zobrist.SIDE_TO_MOVE
+        data = self._data
+        from_cell = SQUARE_INDEX[move_from]
+        to_cell = SQUARE_INDEX[move_to]
+        from_piece = data[from_cell]
+        to_piece = data[to_cell]
         other_index = MatchState.PIECE_KEY.index(other_hand) \
             if other_hand is not None else None
 
         if outcome == 'M':
-            self._board[to_ring][to_index] = from_piece
-            self._board[from_ring][from_index] = '0'
+            self._set_cell(to_cell, from_piece)
+            self._set_cell(from_cell, 0)
         elif outcome == 'W':
-            self._board[to_ring][to_index] = from_piece
-            self._board[from_ring][from_index] = '0'
-            if from_piece[0] == 'O':
-                self._player_counts[self.PIECE_KEY.index(to_piece[1])] -= 1
-                if from_piece[1] == 'U':
-                    # this piece is now known, update the counts
-                    self._board[to_ring][to_index] = 'O' + other_hand
-                    self._opponent_counts[other_index] += 1
-                    self._opponent_counts[3] -= 1
-                if len(to_piece) < 3:
+            self._set_cell(to_cell, from_piece)
+            self._set_cell(from_cell, 0)
+            if from_piece & OPPONENT:
+                data[_PLAYER_COUNTS + (to_piece & TYPE_MASK)] -= 1
+                if from_piece & TYPE_MASK == UNKNOWN:
+                    self._reveal_opponent(to_cell, other_index)
+                if not to_piece & REVEALED:
                     # my piece was unknown, update the reveals count
-                    self._player_reveals[self.PIECE_KEY.index(to_piece[1])] += 1
+                    data[_PLAYER_REVEALS + (to_piece & TYPE_MASK)] += 1
             else:
-                self._captures[other_index] += 1
-                if to_piece[1] == 'U':
+                self._add_capture(other_index)
+                if to_piece & TYPE_MASK == UNKNOWN:
                     # this piece is now known, update the counts
-                    self._opponent_counts[other_index] += 1
-                    self._opponent_counts[3] -= 1
-                if len(from_piece) < 3:
-                    # my piece was unknown, update the reveals count
-                    self._player_reveals[self.PIECE_KEY.index(from_piece[1])] += 1
-                    # mark the piece on the board as revealed
-                    self._board[to_ring][to_index] = from_piece + '!'
+                    data[_OPPONENT_COUNTS + other_index] += 1
+                    data[_OPPONENT_COUNTS + UNKNOWN] -= 1
+                if not from_piece & REVEALED:
+                    # my piece was unknown, update the reveals count, and mark it on the board as revealed
+                    data[_PLAYER_REVEALS + (from_piece & TYPE_MASK)] += 1
+                    self._set_cell(to_cell, from_piece | REVEALED)
         elif outcome == 'T':
-            ring, index = (to_ring, to_index) if from_piece[0] == 'P' else (from_ring, from_index)
-            opponent_piece = self._board[ring][index]
-            if opponent_piece[1] == 'U':
-                # this piece is now known, update the counts
-                self._board[ring][index] = 'O' + other_hand
-                self._opponent_counts[other_index] += 1
-                self._opponent_counts[3] -= 1
-            ring, index = (to_ring, to_index) if from_piece[0] == 'O' else (from_ring, from_index)
-            player_piece = self._board[ring][index]
-            if len(player_piece) < 3:
-                # my piece was unknown, update the reveals count
-                self._player_reveals[self.PIECE_KEY.index(player_piece[1])] += 1
-                # mark the piece on the board as revealed
-                self._board[ring][index] = player_piece + '!'
+            cell = to_cell if from_piece & PLAYER else from_cell
+            if data[cell] & TYPE_MASK == UNKNOWN:
+                self._reveal_opponent(cell, other_index)
+            cell = to_cell if from_piece & OPPONENT else from_cell
+            player_piece = data[cell]
+            if not player_piece & REVEALED:
+                # my piece was unknown, update the reveals count, and mark it on the board as revealed
+                data[_PLAYER_REVEALS + (player_piece & TYPE_MASK)] += 1
+                self._set_cell(cell, player_piece | REVEALED)
         elif outcome == 'L':
-            self._board[from_ring][from_index] = '0'
-            if from_piece[0] == 'P':
-                self._player_counts[self.PIECE_KEY.index(from_piece[1])] -= 1
-                if to_piece[1] == 'U':
-                    # this piece is now known, update the counts
-                    self._board[to_ring][to_index] = 'O' + other_hand
-                    self._opponent_counts[other_index] += 1
-                    self._opponent_counts[3] -= 1
-                if len(from_piece) < 3:
+            self._set_cell(from_cell, 0)
+            if from_piece & PLAYER:
+                data[_PLAYER_COUNTS + (from_piece & TYPE_MASK)] -= 1
+                if to_piece & TYPE_MASK == UNKNOWN:
+                    self._reveal_opponent(to_cell, other_index)
+                if not from_piece & REVEALED:
                     # my piece was unknown, update the reveals count
-                    self._player_reveals[self.PIECE_KEY.index(from_piece[1])] += 1
+                    data[_PLAYER_REVEALS + (from_piece & TYPE_MASK)] += 1
             else:
-                self._captures[other_index] += 1
-                if from_piece[1] == 'U':
+                self._add_capture(other_index)
+                if from_piece & TYPE_MASK == UNKNOWN:
                     # this piece is now known, update the counts
-                    self._opponent_counts[other_index] += 1
-                    self._opponent_counts[3] -= 1
-                if len(to_piece) < 3:
-                    # my piece was unknown, update the reveals count
-                    self._player_reveals[self.PIECE_KEY.index(to_piece[1])] += 1
-                    # mark the piece on the board as revealed
-                    self._board[to_ring][to_index] = to_piece + '!'
+                    data[_OPPONENT_COUNTS + other_index] += 1
+                    data[_OPPONENT_COUNTS + UNKNOWN] -= 1
+                if not to_piece & REVEALED:
+                    # my piece was unknown, update the reveals count, and mark it on the board as revealed
+                    data[_PLAYER_REVEALS + (to_piece & TYPE_MASK)] += 1
+                    self._set_cell(to_cell, to_piece | REVEALED)
+
+    def push_move(self, move_from, move_to, outcome, other_hand=None):
+        """
+        Same as apply_move(), but remember enough to take the move back with pop_move().
+        """
+        data = self._data
+        from_cell = SQUARE_INDEX[move_from]
+        to_cell = SQUARE_INDEX[move_to]
+        # a move only ever changes its two cells and the counters
+        self._undo_stack.append((from_cell, data[from_cell], to_cell, data[to_cell], data[_CAPTURES:], self._hash))
+        self.apply_move(move_from, move_to, outcome, other_hand)
+
+    def pop_move(self):
+        """
+        Take back the last move made with push_move(), restoring the state in place.
+        """
+        from_cell, from_piece, to_cell, to_piece, counters, self._hash = self._undo_stack.pop()
+        data = self._data
+        data[from_cell] = from_piece
+        data[to_cell] = to_piece
+        data[_CAPTURES:] = counters
+        self._turns -= 1
+
+    @property
+    def pushed_moves(self):
+        """
+        The number of moves made with push_move() that have not been taken back yet
+        """
+        return len(self._undo_stack)
 
     def get_possible_moves(self, player):
+        owner = PLAYER if player == 'P' else OPPONENT
+        data = self._data
         moves = []
-        for ring in 'OIC':
-            squares = self._board[ring]
-            for (index, piece) in enumerate(squares):
-                if piece[0] == player:
-                    moves.extend([
-                        ((ring, index), (r, i))
-                        for (r, i) in self.get_piece_moves(ring, index)
-                    ])
+        for cell in range(28):
+            if data[cell] & owner:
+                square = SQUARES[cell]
+                moves.extend([(square, SQUARES[x]) for x in NEIGHBORS[cell] if not data[x] & owner])
         return moves
 
-    def get_piece_moves(self, ring, index):
-        result = []
-        player = self._board[ring][index][0]
-        if player == '0':
-            return result
-
-        if ring == 'O':
-            left = (index + 1) % 18
-            if self._board[ring][left][0] != player:
-                result.append((ring, left))
-            right = (index + 17) % 18
-            if self._board[ring][right][0] != player:
-                result.append((ring, right))
-            inside = int(math.floor(index / 2.0))
-            if self._board['I'][inside][0] != player:
-                result.append(('I', inside))
-        elif ring == 'I':
-            left = (index + 1) % 9
-            if self._board[ring][left][0] != player:
-                result.append((ring, left))
-            right = (index + 8) % 9
-            if self._board[ring][right][0] != player:
-                result.append((ring, right))
-            outside = int(math.floor(index * 2))
-            if self._board['O'][outside][0] != player:
-                result.append(('O', outside))
-            outside += 1
-            if self._board['O'][outside][0] != player:
-                result.append(('O', outside))
-            if self._board['C'][0][0] != player:
-                result.append(('C', 0))
-        elif ring == 'C':
-            result.extend(
-                [('I', i) for (i, v) in
-                 enumerate(self._board['I']) if v[0] != player]
-            )
+    def get_split_moves(self, player):
+        """
+        The same moves as get_possible_moves(), split into the moves onto empty cells and the challenges.
 
-        return result
+        :return: A list of moves, and a list of (move, challenger, defender) tuples with the board values of the two
+            pieces of each challenge
+        """
+        owner = PLAYER if player == 'P' else OPPONENT
+        data = self._data
+        moves = []
+        challenges = []
+        for cell in range(28):
+            code = data[cell]
+            if code & owner:
+                square = SQUARES[cell]
+                for x in NEIGHBORS[cell]:
+                    other = data[x]
+                    if not other:
+                        moves.append((square, SQUARES[x]))
+                    elif not other & owner:
+                        challenges.append(((square, SQUARES[x]), _STRINGS[code], _STRINGS[other]))
+        return moves, challenges
+
+    def get_piece_moves(self, ring, index):
+        data = self._data
+        owner = data[RING_OFFSETS[ring] + index] & (PLAYER | OPPONENT)
+        if not owner:
+            return []
+        return [SQUARES[x] for x in NEIGHBORS[RING_OFFSETS[ring] + index] if not data[x] & owner]
 
     def is_match_over(self):
-        counter_pieces = {'R': 1, 'P': 2, 'S': 0}
-        player_counts = self._player_counts
-        opponent_counts = [3 - self._captures[i] for i in range(3)]
-        if sum(player_counts) == 0:
+        data = self._data
+        if self.num_player_pieces == 0:
             return 1.0, 'O'
-        if sum(opponent_counts) == 0:
+        if self.num_captures == 9:
             return 1.0, 'P'
-        if self._board['C'][0] != '0':
-            center = self._board['C'][0]
-            if center[0] == 'P' and opponent_counts[counter_pieces[center[1]]] == 0:
+        center = data[27]
+        if center:
+            # the index of the piece type that beats the one in the center
+            counter_piece = ((center & TYPE_MASK) + 1) % 3
+            if center & PLAYER and data[_CAPTURES + counter_piece] == 3:
                 return 1.0, 'P'
-            if center[0] == 'O' and center[1] != 'U' and player_counts[counter_pieces[center[1]]] == 0:
+            if center & OPPONENT and center & TYPE_MASK != UNKNOWN and data[_PLAYER_COUNTS + counter_piece] == 0:
                 return 1.0, 'O'
-            if center[0] == 'O' and center[1] == 'U' and 0 in player_counts:
+            player_counts = data[_PLAYER_COUNTS:_PLAYER_COUNTS + 3]
+            if center & OPPONENT and center & TYPE_MASK == UNKNOWN and 0 in player_counts:
                 # opponent may or may not have won!
                 prob_pieces = self.get_opponent_piece_probabilities()
                 # find which pieces we've lost all of
@@ -246,19 +379,20 @@ class MatchState:
         return 0.0, None
 
     def get_opponent_piece_probabilities(self):
+        data = self._data
         probabilities = [0.0] * 3
-        if self._opponent_counts[3] > 0:
+        unknown = data[_OPPONENT_COUNTS + UNKNOWN]
+        if unknown > 0:
             probabilities = [
-                (3.0 - self._opponent_counts[i]) / self._opponent_counts[3] for i in range(3)
+                (3.0 - data[_OPPONENT_COUNTS + i]) / unknown for i in range(3)
             ]
         return probabilities
 
     def get_hash(self):
-        return ''.join(self._board['O']) \
-               + ''.join(self._board['I']) \
-               + ''.join(self._board['C']) \
+        data = self._data
+        return ''.join([_STRINGS[piece] for piece in data[:28]]) \
                + '-' \
-               + ''.join(str(c) for c in self._captures)
+               + ''.join(str(c) for c in data[_CAPTURES:_CAPTURES + 3])
 
     def __str__(self) -> str:
         output = """
@@ -273,15 +407,16 @@ class MatchState:
                     O5 I2  O3
                        O4
         """
-        for ring in self._board.keys():
-            for index in range(len(self._board[ring]) - 1, -1, -1):
-                value = self._board[ring][index]
+        board = self.board
+        for ring in board.keys():
+            for index in range(len(board[ring]) - 1, -1, -1):
+                value = board[ring][index]
                 output = output.replace("%s%d" % (ring, index), '..' if value == '0' else value)
         fmt = '\n{} {}'
         output += fmt.format("Turns:", self._turns)
-        output += fmt.format("Player Counts:", self._player_counts)
-        output += fmt.format("Player Reveals:", self._player_reveals)
-        output += fmt.format("Opponent Captures:", self._captures)
-        output += fmt.format("Opponent Counts:", self._opponent_counts)
+        output += fmt.format("Player Counts:", list(self.player_counts))
+        output += fmt.format("Player Reveals:", list(self.player_reveals))
+        output += fmt.format("Opponent Captures:", list(self.captures))
+        output += fmt.format("Opponent Counts:", list(self.counts))
         output += fmt.format("Probabilities:", self.get_opponent_piece_probabilities())
         return output
@@ -0,0 +1,144 @@
+"""
+   Copyright 2019 Islam Elnabarawy
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+import itertools
+import multiprocessing
+import weakref
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from rps3env.opponents.minmax_opponent import MinMaxOpponent
+
+__author__ = 'Islam Elnabarawy'
+
+# the opponents searched by this worker process, by their key, each with the tables of its earlier searches
+_opponents = {}
+
+
+def _next_moves(batch, forgotten):
+    for key in forgotten:
+        _opponents.pop(key, None)
+    results = []
+    for key, settings, state in batch:
+        if settings is not None:
+            _opponents[key] = MinMaxOpponent(**settings)
+        opponent = _opponents[key]
+        opponent.set_state(state)
+        results.append((opponent.next_move_idx(), opponent.last_search_stats))
+    return results
+
+
+class OpponentService(object):
+    """
+    Chooses the next opponent move for many environments, so that they can share one pool of search workers.
+
+    submit() queues a decision and returns a Future of the move as a (from, to) tuple of cell indices. Queued
+    decisions are sent out in batches of batch_size whenever that many are waiting, or when flush() is called.
+
+    With the 'process' backend, MinMax decisions are searched by num_workers worker processes. Each opponent is
+    pinned to one of them, which builds its own copy of the opponent from its search settings, with empty tables, on
+    its first decision, and keeps it until the opponent is garbage collected. Later decisions only send the
+    opponent's MatchState, and get back the move and the search stats, so every opponent searches exactly as it
+    would on its own, but its tables stay in the worker, and changing its settings afterwards has no effect there.
+    Every other opponent, and every decision with the 'inline' backend, is searched by the opponent object itself
+    in the calling process when its batch is sent out.
+    """
+
+    BACKENDS = ('inline', 'process')
+
+    def __init__(self, num_workers=None, backend='process', batch_size=8) -> None:
+        if backend not in self.BACKENDS:
+            raise ValueError("Unknown backend %r, expected one of %s" % (backend, self.BACKENDS))
+        self._backend = backend
+        self._batch_size = batch_size
+        self._queue = []
+        self._workers = []
+        if backend == 'process':
+            # a process each, so that every opponent's decisions go to the worker that has its tables
+            self._workers = [ProcessPoolExecutor(1) for _ in range(num_workers or multiprocessing.cpu_count())]
+        self._keys = weakref.WeakKeyDictionary()
+        self._next_key = itertools.count()
+        # the keys of opponents that were garbage collected, for each worker to drop with its next batch
+        self._forgotten = [[] for _ in self._workers]
+
+    @property
+    def backend(self):
+        return self._backend
+
+    def submit(self, opponent):
+        """
+        :param opponent: The opponent to move, whose state is captured now, so it can be changed before the move
+            comes back
+        :return: A Future of the opponent's next move
+        """
+        future = Future()
+        if self._workers and isinstance(opponent, MinMaxOpponent):
+            settings = None
+            if opponent not in self._keys:
+                key = next(self._next_key)
+                worker = key % len(self._workers)
+                self._keys[opponent] = worker, key
+                weakref.finalize(opponent, self._forgotten[worker].append, key)
+                settings = opponent.search_settings
+            worker, key = self._keys[opponent]
+            self._queue.append((future, opponent, (worker, (key, settings, opponent.get_state()))))
+        else:
+            self._queue.append((future, opponent, None))
+        if len(self._queue) >= self._batch_size:
+            self.flush()
+        return future
+
+    def flush(self):
+        """
+        Send out every queued decision.
+        """
+        queue, self._queue = self._queue, []
+        for worker, pool in enumerate(self._workers):
+            remote = [item for item in queue if item[2] is not None and item[2][0] == worker]
+            for start in range(0, len(remote), self._batch_size):
+                batch = remote[start:start + self._batch_size]
+                forgotten = self._forgotten[worker][:]
+                del self._forgotten[worker][:len(forgotten)]
+                pool_future = pool.submit(_next_moves, [request for _, _, (_, request) in batch], forgotten)
+                pool_future.add_done_callback(lambda f, batch=batch: self._set_results(batch, f))
+        for future, opponent, request in queue:
+            if request is None and future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(opponent.next_move_idx())
+                except Exception as e:
+                    future.set_exception(e)
+
+    @staticmethod
+    def _set_results(batch, pool_future):
+        try:
+            results = pool_future.result()
+        except Exception as e:
+            for future, _, _ in batch:
+                if future.set_running_or_notify_cancel():
+                    future.set_exception(e)
+            return
+        for (future, opponent, _), (move, stats) in zip(batch, results):
+            if future.set_running_or_notify_cancel():
+                try:
+                    opponent.record_search_stats(stats)
+                except Exception as e:
+                    future.set_exception(e)
+                else:
+                    future.set_result(move)
+
+    def close(self):
+        self.flush()
+        for pool in self._workers:
+            pool.shutdown()
+        self._workers = []
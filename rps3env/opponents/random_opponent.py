@@ -13,9 +13,8 @@
    See the License for the specific language governing permissions and
    limitations under the License.
 """
-import random
-
 from rps3env.opponents import BaseOpponent
+from rps3env.topology import SQUARE_INDEX
 
 __author__ = 'Islam Elnabarawy'
 
@@ -24,13 +23,20 @@ class RandomOpponent(BaseOpponent):
 
     def _get_board_layout(self):
         layout = ['R', 'P', 'S'] * 3
-        random.shuffle(layout)
+        self._rng.shuffle(layout)
         return layout
 
     def get_player_hand(self):
-        hand = random.choice(['R', 'P', 'S'])
+        hand = self._rng.choice(['R', 'P', 'S'])
         return hand
 
     def get_next_move(self):
         choices = self.get_possible_moves('P')
-        return random.choice(choices) if len(choices) > 0 else None
+        return self._rng.choice(choices) if len(choices) > 0 else None
+
+    def next_move_idx(self):
+        moves = self._state.get_possible_moves('P')
+        if len(moves) == 0:
+            return None
+        move_from, move_to = self._rng.choice(moves)
+        return SQUARE_INDEX[move_from], SQUARE_INDEX[move_to]
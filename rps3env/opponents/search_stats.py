@@ -0,0 +1,107 @@
+"""
+   Copyright 2019 Islam Elnabarawy
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+from collections import namedtuple
+
+__author__ = 'Islam Elnabarawy'
+
+
+class SearchStats(namedtuple('SearchStats', [
+    'depth', 'nodes', 'time_ms', 'budget_exhausted', 'iteration_nodes', 'iteration_time_ms', 'cutoffs',
+    'chance_prunes', 'tt_probes', 'tt_hits', 'history_probes', 'history_hits'
+])):
+    """
+    What one move search did.
+
+    depth is the deepest iteration that was completed, nodes and time_ms are the totals over every iteration, and
+    budget_exhausted says whether a time or node budget cut the search short. iteration_nodes and iteration_time_ms
+    hold the same per iteration, including an unfinished last one. cutoffs counts the alpha-beta cutoffs, and
+    chance_prunes the chance nodes that were left before all three piece types had been searched. The probes and
+    hits count the lookups in the transposition table and in the history table that found an entry.
+    """
+    __slots__ = ()
+
+    @property
+    def tt_hit_rate(self):
+        return self.tt_hits / self.tt_probes if self.tt_probes else 0.0
+
+    @property
+    def history_hit_rate(self):
+        return self.history_hits / self.history_probes if self.history_probes else 0.0
+
+    @property
+    def branching_factor(self):
+        """
+        The effective branching factor: how many times more nodes the last iteration took than the one before it
+        """
+        if len(self.iteration_nodes) < 2 or not self.iteration_nodes[-2]:
+            return 0.0
+        return self.iteration_nodes[-1] / self.iteration_nodes[-2]
+
+    def as_dict(self):
+        result = self._asdict()
+        result['tt_hit_rate'] = self.tt_hit_rate
+        result['history_hit_rate'] = self.history_hit_rate
+        result['branching_factor'] = self.branching_factor
+        return result
+
+
+class SearchStatsAggregator(object):
+    """
+    Collects the SearchStats of many move searches and sums them up.
+    """
+
+    def __init__(self) -> None:
+        self._stats = []
+
+    def __len__(self):
+        return len(self._stats)
+
+    def add(self, stats: SearchStats):
+        self._stats.append(stats)
+
+    def clear(self):
+        self._stats = []
+
+    def summary(self):
+        """
+        :return: A dict with the number of moves, the totals of the counters, and the mean and the worst case of the
+            depth reached and the time per move
+        """
+        count = len(self._stats)
+        if count == 0:
+            return {'moves': 0}
+        total = {field: sum(getattr(s, field) for s in self._stats) for field in (
+            'nodes', 'time_ms', 'cutoffs', 'chance_prunes', 'tt_probes', 'tt_hits', 'history_probes', 'history_hits'
+        )}
+        times = sorted(s.time_ms for s in self._stats)
+        branching = [s.branching_factor for s in self._stats if s.branching_factor]
+        return {
+            'moves': count,
+            'nodes': total['nodes'],
+            'nodes_per_move': total['nodes'] / count,
+            'nodes_per_second': total['nodes'] / total['time_ms'] * 1000 if total['time_ms'] else 0.0,
+            'mean_depth': sum(s.depth for s in self._stats) / count,
+            'min_depth': min(s.depth for s in self._stats),
+            'budget_exhausted': sum(1 for s in self._stats if s.budget_exhausted),
+            'mean_time_ms': total['time_ms'] / count,
+            'p95_time_ms': times[min(count - 1, int(0.95 * count))],
+            'max_time_ms': times[-1],
+            'cutoffs': total['cutoffs'],
+            'chance_prunes': total['chance_prunes'],
+            'tt_hit_rate': total['tt_hits'] / total['tt_probes'] if total['tt_probes'] else 0.0,
+            'history_hit_rate': total['history_hits'] / total['history_probes'] if total['history_probes'] else 0.0,
+            'branching_factor': sum(branching) / len(branching) if branching else 0.0,
+        }
@@ -0,0 +1,53 @@
+"""
+   Copyright 2019 Islam Elnabarawy
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+import logging
+from collections import namedtuple
+
+import rps3env.config
+
+__author__ = 'Islam Elnabarawy'
+
+logger = logging.getLogger(__name__)
+logger.setLevel(rps3env.config.OPPONENT_LOG_LEVEL)
+
+# event kinds
+NODE = 'node'  # a node was entered, with the window it is searched with
+CUTOFF = 'cutoff'  # a node failed high or low on move, with value
+CHANCE_PRUNE = 'chance_prune'  # the chance node of move was left before all of its outcomes were searched
+RESULT = 'result'  # a node was searched to the end, and move is its best move with value
+ITERATION = 'iteration'  # an iteration of iterative deepening was completed, and move is its best move
+
+SearchEvent = namedtuple('SearchEvent', ['kind', 'ply', 'depth', 'maximizing', 'alpha', 'beta', 'move', 'value'])
+
+
+class LoggingSink(object):
+    """
+    A tracer that writes search events to a logger, indented by their ply.
+
+    A tracer is any callable that takes a SearchEvent, so a list's append method works as one too.
+    """
+
+    def __init__(self, log=None, level=logging.DEBUG) -> None:
+        self.log = log if log is not None else logger
+        self.level = level
+
+    def __call__(self, event: SearchEvent):
+        if not self.log.isEnabledFor(self.level):
+            return
+        move = '%s%s:%s%s' % (event.move[0] + event.move[1]) if event.move is not None else None
+        self.log.log(self.level, '%s%s %s @ depth: %s, alpha: %s, beta: %s, move: %s, value: %s',
+                     '\t' * event.ply, event.kind, 'max' if event.maximizing else 'min', event.depth,
+                     event.alpha, event.beta, move, event.value)
@@ -0,0 +1,82 @@
+"""
+   Copyright 2019 Islam Elnabarawy
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+from collections import namedtuple
+
+__author__ = 'Islam Elnabarawy'
+
+# bound types: the stored value is exact, or only a lower or an upper bound on the real one
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+TTEntry = namedtuple('TTEntry', ['key', 'depth', 'bound', 'value', 'move', 'age'])
+
+
+class TranspositionTable(object):
+    """
+    Fixed-size table of search results keyed by MatchState.zobrist_hash.
+
+    Every key maps to a bucket of two slots. The first one keeps the deepest result from the current search and the
+    second one always takes whatever the first one turned down, so the table never grows and entries left over from
+    earlier searches get replaced as the game goes on.
+    """
+
+    def __init__(self, size=1 << 16) -> None:
+        """
+        :param size: The number of entries to keep, rounded down to a power of two, and at least 2
+        """
+        entries = 1 << max(1, size.bit_length() - 1)
+        self._mask = (entries >> 1) - 1
+        self._entries = [None] * entries
+        self._age = 0
+        self.probes = 0
+        self.hits = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def new_search(self):
+        """
+        Mark the entries stored so far as old, so that the next search can replace them regardless of depth.
+        """
+        self._age += 1
+
+    def clear(self):
+        self._entries = [None] * len(self._entries)
+        self._age = 0
+        self.probes = 0
+        self.hits = 0
+
+    def probe(self, key):
+        """
+        :return: The TTEntry stored for key, or None
+        """
+        self.probes += 1
+        index = (key & self._mask) << 1
+        for entry in (self._entries[index], self._entries[index + 1]):
+            if entry is not None and entry.key == key:
+                self.hits += 1
+                return entry
+        return None
+
+    def store(self, key, depth, bound, value, move):
+        index = (key & self._mask) << 1
+        entry = TTEntry(key, depth, bound, value, move, self._age)
+        preferred = self._entries[index]
+        if preferred is None or preferred.key == key or preferred.age != self._age or depth >= preferred.depth:
+            self._entries[index] = entry
+        else:
+            self._entries[index + 1] = entry
@@ -0,0 +1,38 @@
+"""
+   Copyright 2019 Islam Elnabarawy
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+import os
+import random
+
+__author__ = 'Islam Elnabarawy'
+
+
+def create_seed(seed=None):
+    """
+    :return: The given seed, or a new 128-bit one from os.urandom if it is None
+    """
+    if seed is None:
+        return int.from_bytes(os.urandom(16), 'big')
+    return seed
+
+
+def fork_seeds(seed, count):
+    """
+    Derive count independent seeds from one, e.g. one for every match in a vector env.
+
+    :return: A list of count 64-bit seeds that only depend on seed
+    """
+    rng = random.Random(seed)
+    return [rng.getrandbits(64) for _ in range(count)]
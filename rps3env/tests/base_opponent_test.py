@@ -186,14 +186,14 @@ class TestBaseOpponentDefaultBoard(TestBaseOpponent):
     def test_defaultBoardBlueSide(self):
         opponent = ConcreteBaseOpponent()
         opponent.init_board_layout(0)
-        self.assertEqual(self.DEFAULT_BLUE_BOARD, opponent.board)
-        self.assertEqual([0] * 3 + [9], opponent.counts)
+        self.assertEqual(self.DEFAULT_BLUE_BOARD, opponent.snapshot())
+        self.assertEqual((0,) * 3 + (9,), opponent.counts)
 
     def test_defaultBoardGreenSide(self):
         opponent = ConcreteBaseOpponent()
         opponent.init_board_layout(1)
-        self.assertEqual(self.DEFAULT_GREEN_BOARD, opponent.board)
-        self.assertEqual([0] * 3 + [9], opponent.counts)
+        self.assertEqual(self.DEFAULT_GREEN_BOARD, opponent.snapshot())
+        self.assertEqual((0,) * 3 + (9,), opponent.counts)
 
 
 class TestBaseOpponentPlayerHand(TestBaseOpponent):
@@ -209,7 +209,7 @@ class TestBaseOpponentClearMoves(TestBaseOpponent):
 
     def test_outerPiecePlayerClearMoves(self):
         opponent = ConcreteBaseOpponent()
-        board = opponent.board
+        board = opponent.snapshot()
         board['O'][4] = 'PR'
         opponent.reset_board(board)
         possible_moves = opponent.get_move_list('O', 4)
@@ -217,7 +217,7 @@ class TestBaseOpponentClearMoves(TestBaseOpponent):
 
     def test_innerPiecePlayerClearMoves(self):
         opponent = ConcreteBaseOpponent()
-        board = opponent.board
+        board = opponent.snapshot()
         board['I'][2] = 'PR'
         opponent.reset_board(board)
         possible_moves = opponent.get_move_list('I', 2)
@@ -225,7 +225,7 @@ class TestBaseOpponentClearMoves(TestBaseOpponent):
 
     def test_centerPiecePlayerClearMoves(self):
         opponent = ConcreteBaseOpponent()
-        board = opponent.board
+        board = opponent.snapshot()
         board['C'][0] = 'PR'
         opponent.reset_board(board)
         possible_moves = opponent.get_move_list('C', 0)
@@ -233,7 +233,7 @@ class TestBaseOpponentClearMoves(TestBaseOpponent):
 
     def test_outerPieceOpponentClearMoves(self):
         opponent = ConcreteBaseOpponent()
-        board = opponent.board
+        board = opponent.snapshot()
         board['O'][4] = 'OU'
         opponent.reset_board(board)
         possible_moves = opponent.get_move_list('O', 4)
@@ -241,7 +241,7 @@ class TestBaseOpponentClearMoves(TestBaseOpponent):
 
     def test_innerPieceOpponentClearMoves(self):
         opponent = ConcreteBaseOpponent()
-        board = opponent.board
+        board = opponent.snapshot()
         board['I'][2] = 'OU'
         opponent.reset_board(board)
         possible_moves = opponent.get_move_list('I', 2)
@@ -249,7 +249,7 @@ class TestBaseOpponentClearMoves(TestBaseOpponent):
 
     def test_centerPieceOpponentClearMoves(self):
         opponent = ConcreteBaseOpponent()
-        board = opponent.board
+        board = opponent.snapshot()
         board['C'][0] = 'OU'
         opponent.reset_board(board)
         possible_moves = opponent.get_move_list('C', 0)
@@ -260,7 +260,7 @@ class TestBaseOpponentChallengeMoves(TestBaseOpponent):
 
     def test_outerPiecePlayerChallengeOuterMove(self):
         opponent = ConcreteBaseOpponent()
-        board = opponent.board
+        board = opponent.snapshot()
         board['O'][0] = 'PR'
         board['O'][1] = 'PR'
         board['O'][-1] = 'OU'
@@ -270,7 +270,7 @@ class TestBaseOpponentChallengeMoves(TestBaseOpponent):
 
     def test_outerPiecePlayerChallengeInnerMove(self):
         opponent = ConcreteBaseOpponent()
-        board = opponent.board
+        board = opponent.snapshot()
         board['O'][0] = 'PR'
         board['O'][1] = 'PR'
         board['I'][0] = 'OU'
@@ -280,7 +280,7 @@ class TestBaseOpponentChallengeMoves(TestBaseOpponent):
 
     def test_innerPiecePlayerChallengeOuterMove(self):
         opponent = ConcreteBaseOpponent()
-        board = opponent.board
+        board = opponent.snapshot()
         board['I'][0] = 'PR'
         board['O'][1] = 'PR'
         board['O'][0] = 'OU'
@@ -290,7 +290,7 @@ class TestBaseOpponentChallengeMoves(TestBaseOpponent):
 
     def test_innerPiecePlayerChallengeInnerMove(self):
         opponent = ConcreteBaseOpponent()
-        board = opponent.board
+        board = opponent.snapshot()
         board['I'][0] = 'PR'
         board['O'][1] = 'PR'
         board['I'][8] = 'OU'
@@ -300,7 +300,7 @@ class TestBaseOpponentChallengeMoves(TestBaseOpponent):
 
     def test_innerPiecePlayerChallengeCenterMove(self):
         opponent = ConcreteBaseOpponent()
-        board = opponent.board
+        board = opponent.snapshot()
         board['I'][0] = 'PR'
         board['O'][1] = 'PR'
         board['C'][0] = 'OU'
@@ -310,7 +310,7 @@ class TestBaseOpponentChallengeMoves(TestBaseOpponent):
 
     def test_centerPiecePlayerChallengeInnerMove(self):
         opponent = ConcreteBaseOpponent()
-        board = opponent.board
+        board = opponent.snapshot()
         board['C'][0] = 'PR'
         board['I'][0] = 'PR'
         board['I'][1] = 'PS'
@@ -359,8 +359,8 @@ class TestBaseOpponentApplyMovePlayer(TestBaseOpponent):
         opponent.apply_move(move)
         self.assertEqual('0', opponent.board['O'][0])
         self.assertEqual('PR!', opponent.board['O'][17])
-        self.assertEqual(opponent._state.player_counts, [3, 3, 3])
-        self.assertEqual(opponent.captures, [0, 0, 1])
+        self.assertEqual(opponent._state.player_counts, (3, 3, 3))
+        self.assertEqual(opponent.captures, (0, 0, 1))
 
     def test_applyPlayerChallengeLoss(self):
         opponent = ConcreteBaseOpponent()
@@ -374,8 +374,8 @@ class TestBaseOpponentApplyMovePlayer(TestBaseOpponent):
         opponent.apply_move(move)
         self.assertEqual('0', opponent.board['O'][0])
         self.assertEqual('OP', opponent.board['O'][17])
-        self.assertEqual(opponent._state.player_counts, [2, 3, 3])
-        self.assertEqual(opponent.captures, [0, 0, 0])
+        self.assertEqual(opponent._state.player_counts, (2, 3, 3))
+        self.assertEqual(opponent.captures, (0, 0, 0))
 
     def test_applyPlayerSurrender(self):
         opponent = ConcreteBaseOpponent()
@@ -384,7 +384,7 @@ class TestBaseOpponentApplyMovePlayer(TestBaseOpponent):
             'surrender': True
         }
         opponent.apply_move(move)
-        self.assertEqual(self.DEFAULT_BLUE_BOARD, opponent.board)
+        self.assertEqual(self.DEFAULT_BLUE_BOARD, opponent.snapshot())
 
 
 class TestBaseOpponentApplyMoveOpponent(TestBaseOpponent):
@@ -447,4 +447,33 @@ class TestBaseOpponentApplyMoveOpponent(TestBaseOpponent):
             'surrender': True
         }
         opponent.apply_move(move)
-        self.assertEqual(self.DEFAULT_BLUE_BOARD, opponent.board)
+        self.assertEqual(self.DEFAULT_BLUE_BOARD, opponent.snapshot())
+
+
+class TestBaseOpponentIndexMoves(TestBaseOpponent):
+
+    def test_applyMoveIdx(self):
+        moves = [
+            ({'from': 'O0', 'to': 'I0', 'outcome': 'M'}, (0, 18, 'M', None)),
+            ({'from': 'O17', 'to': 'I8', 'outcome': 'M'}, (17, 26, 'M', None)),
+            ({'from': 'O8', 'to': 'O9', 'outcome': 'T', 'otherHand': 'S'}, (8, 9, 'T', 3)),
+            ({'from': 'I8', 'to': 'I0', 'outcome': 'W', 'otherHand': 'P'}, (26, 18, 'W', 2)),
+            ({'from': 'O10', 'to': 'I5', 'outcome': 'M'}, (10, 23, 'M', None)),
+            ({'from': 'O8', 'to': 'I4', 'outcome': 'M'}, (8, 22, 'M', None)),
+            ({'from': 'I4', 'to': 'I5', 'outcome': 'L', 'otherHand': 'R'}, (22, 23, 'L', 1)),
+        ]
+        expected, actual = ConcreteBaseOpponent(), ConcreteBaseOpponent()
+        expected.init_board_layout(0)
+        actual.init_board_layout(0)
+        for move_data, move_idx in moves:
+            expected.apply_move(move_data)
+            actual.apply_move_idx(*move_idx)
+            self.assertEqual(expected.board, actual.board)
+            self.assertEqual(expected.captures, actual.captures)
+            self.assertEqual(expected.counts, actual.counts)
+
+    def test_nextMoveIdx(self):
+        opponent = ConcreteBaseOpponent()
+        opponent.init_board_layout(0)
+        self.assertEqual((0, 17), opponent.next_move_idx())
+        self.assertIsNone(ConcreteBaseOpponent().next_move_idx())
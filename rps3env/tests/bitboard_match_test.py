@@ -0,0 +1,156 @@
+"""
+   Copyright 2019 Islam Elnabarawy
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+import random
+import unittest
+from itertools import starmap
+
+from rps3env import classes
+from rps3env.tests.match_test import BLUE_SETUP, RED_SETUP, BAD_SETUP
+
+__author__ = 'Islam Elnabarawy'
+
+
+def board_to_tuples(board):
+    return [(p.piece_type, p.color, p.revealed) if p is not None else None for p in board]
+
+
+class BitboardMatchTest(unittest.TestCase):
+    def setUp(self):
+        self.match = classes.BitboardMatch()
+
+    def setup_board(self):
+        self.match.set_board(BLUE_SETUP, classes.PlayerColor.Blue)
+        self.match.set_board(RED_SETUP, classes.PlayerColor.Red)
+
+    def test_empty_board(self):
+        self.assertListEqual(self.match.board, [None for _ in range(28)])
+
+    def test_valid_setup(self):
+        self.setup_board()
+        for i in range(9):
+            self.assertEqual(classes.PlayerColor.Blue, self.match.board[i].color)
+            self.assertEqual(BLUE_SETUP[i], self.match.board[i].piece_type.value)
+        for i in range(9, 18):
+            self.assertEqual(classes.PlayerColor.Red, self.match.board[i].color)
+            self.assertEqual(RED_SETUP[i - 9], self.match.board[i].piece_type.value)
+        for i in range(18, 28):
+            self.assertIsNone(self.match.board[i])
+
+    def test_invalid_setup(self):
+        self.assertRaises(AssertionError, lambda: self.match.set_board(BAD_SETUP, classes.PlayerColor.Blue))
+
+    def test_make_move_illegal_movements(self):
+        self.setup_board()
+        self.assertRaises(AssertionError, lambda: self.match.make_move(0, 19, classes.PlayerColor.Blue))
+        self.assertRaises(AssertionError, lambda: self.match.make_move(0, 1, classes.PlayerColor.Blue))
+        self.assertRaises(AssertionError, lambda: self.match.make_move(9, 22, classes.PlayerColor.Blue))
+        self.assertRaises(AssertionError, lambda: self.match.make_move(18, 19, classes.PlayerColor.Blue))
+        self.assertRaises(AssertionError, lambda: self.match.make_move(9, 22, classes.PlayerColor.Red))
+
+    def test_make_move_challenges(self):
+        self.setup_board()
+        self.assertEqual((0, classes.PieceType.S), self.match.make_move(8, 9, classes.PlayerColor.Blue))
+        self.assertTrue(self.match.board[8].revealed)
+        self.assertTrue(self.match.board[9].revealed)
+        self.assertEqual((1, classes.PieceType.R), self.match.make_move(17, 0, classes.PlayerColor.Red))
+        self.assertIsNone(self.match.board[17])
+        self.assertTrue(self.match.board[0].revealed)
+        self.assertEqual(classes.PlayerColor.Red, self.match.board[0].color)
+        self.assertEqual((0, classes.PieceType.P), self.match.make_move(1, 0, classes.PlayerColor.Blue))
+        self.assertTrue(self.match.board[1].revealed)
+
+    def test_make_move_challenge_loss(self):
+        self.setup_board()
+        self.assertEqual((-1, classes.PieceType.P), self.match.make_move(0, 17, classes.PlayerColor.Blue))
+        self.assertIsNone(self.match.board[0])
+        self.assertTrue(self.match.board[17].revealed)
+
+    def test_clone(self):
+        self.setup_board()
+        match_clone = self.match.clone()
+        self.assertEqual(board_to_tuples(self.match.board), board_to_tuples(match_clone.board))
+        self.match.make_move(0, 18, classes.PlayerColor.Blue)
+        self.assertNotEqual(match_clone.moves, self.match.moves)
+        self.assertIsNotNone(match_clone.board[0])
+        self.assertIsNone(match_clone.board[18])
+
+    def test_push_pop_random_walk(self):
+        self.setup_board()
+        rng = random.Random(0)
+        snapshots = []
+        while not self.match.game_over:
+            snapshots.append((board_to_tuples(self.match.board), self.match.moves[:], self.match.zobrist_hash))
+            color, moves = self.match.get_possible_moves()
+            self.match.push_move(*rng.choice(moves))
+        while snapshots:
+            self.match.pop_move()
+            self.assertEqual(
+                snapshots.pop(), (board_to_tuples(self.match.board), self.match.moves[:], self.match.zobrist_hash)
+            )
+        self.assertFalse(self.match.game_over)
+        self.assertEqual(classes.PlayerColor.Blue, self.match.get_possible_moves()[0])
+
+    def test_possible_moves(self):
+        self.setup_board()
+        expected = classes.Match()
+        expected.set_board(BLUE_SETUP, classes.PlayerColor.Blue)
+        expected.set_board(RED_SETUP, classes.PlayerColor.Red)
+        self.assertEqual(expected.get_possible_moves(), self.match.get_possible_moves())
+        self.match.make_move(0, 18, classes.PlayerColor.Blue)
+        expected.make_move(0, 18, classes.PlayerColor.Blue)
+        self.assertEqual(expected.get_possible_moves(), self.match.get_possible_moves())
+
+    def test_game_over_capture_all(self):
+        from rps3env.classes import PlayerColor, PieceType
+
+        self.match.set_board(BLUE_SETUP, PlayerColor.Blue)
+        self.match.set_board([2, 2, 2, 1, 1, 1, 3, 3, 3], PlayerColor.Red)
+
+        move_sequence = [
+            (0, 17, PlayerColor.Blue), (14, 25, PlayerColor.Red), (17, 16, PlayerColor.Blue), (13, 24, PlayerColor.Red),
+            (16, 15, PlayerColor.Blue), (24, 23, PlayerColor.Red), (8, 9, PlayerColor.Blue), (12, 24, PlayerColor.Red),
+            (9, 10, PlayerColor.Blue), (23, 22, PlayerColor.Red), (10, 11, PlayerColor.Blue), (25, 27, PlayerColor.Red),
+            (7, 21, PlayerColor.Blue), (22, 21, PlayerColor.Red), (21, 22, PlayerColor.Blue), (27, 22, PlayerColor.Red),
+            (22, 23, PlayerColor.Blue), (24, 23, PlayerColor.Red)
+        ]
+        result_sequence = [
+            (1, PieceType.S), (0, None), (1, PieceType.S), (0, None), (1, PieceType.S), (0, None), (1, PieceType.P),
+            (0, None), (1, PieceType.P), (0, None), (1, PieceType.P), (0, None), (0, None), (-1, PieceType.P),
+            (0, None), (-1, PieceType.P), (0, None), (-101, PieceType.P)
+        ]
+        self.assertListEqual(result_sequence, list(starmap(self.match.make_move, move_sequence)))
+        self.assertTrue(self.match.game_over)
+        self.assertListEqual(move_sequence, self.match.moves[2:])
+
+    def test_random_games_match_reference(self):
+        rng = random.Random(0)
+        for _ in range(50):
+            reference, match = classes.Match(), classes.BitboardMatch()
+            for color in classes.PlayerColor:
+                layout = [1, 2, 3] * 3
+                rng.shuffle(layout)
+                reference.set_board(layout, color)
+                match.set_board(layout, color)
+            while not reference.game_over:
+                color, moves = reference.get_possible_moves()
+                self.assertEqual((color, moves), match.get_possible_moves())
+                move = rng.choice(moves)
+                self.assertEqual(reference.make_move(*move, color), match.make_move(*move, color))
+                self.assertEqual(board_to_tuples(reference.board), board_to_tuples(match.board))
+                self.assertEqual(reference.zobrist_hash, match.zobrist_hash)
+                for c in classes.PlayerColor:
+                    self.assertEqual(reference.piece_counts(c), match.piece_counts(c))
+            self.assertTrue(match.game_over)
@@ -0,0 +1,51 @@
+"""
+   Copyright 2019 Islam Elnabarawy
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+import unittest
+
+from rps3env.opponents.history_table import HistoryTable
+
+__author__ = 'Islam Elnabarawy'
+
+
+class HistoryTableTest(unittest.TestCase):
+
+    def test_getScoresCreates(self):
+        table = HistoryTable(4)
+        scores = table.get_scores(7)
+        scores['move'] = 1
+        self.assertIn(7, table)
+        self.assertIs(scores, table.get_scores(7))
+        self.assertEqual({7: {'move': 1}}, dict(table.items()))
+
+    def test_leastRecentlyUsedEviction(self):
+        table = HistoryTable(2)
+        table.get_scores(1)
+        table.get_scores(2)
+        table.get_scores(1)
+        table.get_scores(3)
+        self.assertIn(1, table)
+        self.assertNotIn(2, table)
+        self.assertIn(3, table)
+        self.assertEqual({'entries': 2, 'max_entries': 2, 'evictions': 1, 'probes': 4, 'hits': 1}, table.stats())
+
+    def test_unbounded(self):
+        table = HistoryTable(None)
+        for key in range(100):
+            table.get_scores(key)
+        self.assertEqual(100, len(table))
+        self.assertEqual(0, table.evictions)
+        table.clear()
+        self.assertEqual(0, len(table))
@@ -39,11 +39,11 @@ class TestMatchStatePieceCounts(unittest.TestCase):
 
     def test_getDefaultBoardCounts(self):
         state = MatchState(TestBaseOpponent.DEFAULT_BLUE_BOARD)
-        self.assertEqual([0] * 3 + [9], state._opponent_counts)
+        self.assertEqual((0,) * 3 + (9,), state.counts)
 
     def test_getEmptyBoardCounts(self):
         state = MatchState()
-        self.assertEqual([0] * 4, state._opponent_counts)
+        self.assertEqual((0,) * 4, state.counts)
 
 
 class TestMatchStateClone(unittest.TestCase):
@@ -56,9 +56,133 @@ class TestMatchStateClone(unittest.TestCase):
     def test_cloneDeepCopy(self):
         state1 = MatchState()
         state2 = state1.clone()
-        self.assertIsNot(state1._board, state2._board)
-        self.assertIsNot(state1._captures, state2._captures)
-        self.assertIsNot(state1._opponent_counts, state2._opponent_counts)
+        self.assertIsNot(state1._data, state2._data)
+
+    def test_cloneIndependent(self):
+        state1 = MatchState(TestBaseOpponent.DEFAULT_BLUE_BOARD)
+        state1.apply_move(('O', 0), ('I', 0), 'M')
+        state2 = state1.clone()
+        state2.apply_move(('I', 0), ('C', 0), 'M')
+        self.assertEqual('PR', state1.get_board_value('I', 0))
+        self.assertEqual('0', state1.get_board_value('C', 0))
+        self.assertEqual('PR', state2.get_board_value('C', 0))
+        self.assertEqual(1, state1.turns)
+        self.assertEqual(2, state2.turns)
+        self.assertEqual(state1.zobrist_hash, state1._compute_hash())
+        self.assertEqual(state2.zobrist_hash, state2._compute_hash())
+
+
+class TestMatchStateEncoding(unittest.TestCase):
+
+    def test_boardRoundTrip(self):
+        board = copy.deepcopy(MatchState.STARTING_BOARD)
+        board['O'][:4] = ['PR', 'PP!', 'OU', 'OS']
+        board['I'][0] = 'PS!'
+        board['C'][0] = 'OR'
+        state = MatchState(board, [1, 0, 2])
+        self.assertEqual(board, state.snapshot())
+        self.assertEqual((1, 0, 2), state.captures)
+        self.assertEqual((1, 1, 1), state.player_counts)
+        self.assertEqual((0, 1, 1), state.player_reveals)
+        self.assertEqual((2, 0, 3, 1), state.counts)
+        self.assertEqual(3, state.num_captures)
+        self.assertEqual(1, state.num_unknown)
+        self.assertEqual(3, state.num_player_pieces)
+        self.assertEqual('PRPP!OUOS' + '0' * 14 + 'PS!' + '0' * 8 + 'OR-102', state.get_hash())
+
+
+class TestMatchStateViews(unittest.TestCase):
+
+    def test_boardIsReadOnly(self):
+        state = MatchState(TestBaseOpponent.DEFAULT_BLUE_BOARD)
+        board = state.board
+        self.assertEqual(tuple(TestBaseOpponent.DEFAULT_BLUE_BOARD['O']), board['O'])
+        with self.assertRaises(TypeError):
+            board['C'] = ('PR',)
+        with self.assertRaises(TypeError):
+            board['O'][0] = '0'
+
+    def test_snapshotIsIndependent(self):
+        state = MatchState(TestBaseOpponent.DEFAULT_BLUE_BOARD)
+        board = state.snapshot()
+        board['O'][0] = '0'
+        self.assertEqual('PR', state.get_board_value('O', 0))
+        self.assertEqual(TestBaseOpponent.DEFAULT_BLUE_BOARD, state.snapshot())
+
+
+class TestMatchStateZobristHash(unittest.TestCase):
+
+    def test_emptyBoardHash(self):
+        state = MatchState()
+        self.assertEqual(state._compute_hash(), state.zobrist_hash)
+        self.assertNotEqual(MatchState(TestBaseOpponent.DEFAULT_BLUE_BOARD).zobrist_hash, state.zobrist_hash)
+
+    def test_incrementalHash(self):
+        board = copy.deepcopy(TestBaseOpponent.DEFAULT_BLUE_BOARD)
+        state = MatchState(board)
+        hashes = {state.zobrist_hash}
+        for move in [
+            (('O', 17), ('O', 0), 'W', 'P'), (('O', 1), ('O', 0), 'L', 'P'), (('O', 0), ('O', 1), 'M', None),
+            (('O', 2), ('O', 1), 'T', 'S'), (('O', 9), ('O', 8), 'L', 'R'), (('O', 7), ('I', 3), 'M', None),
+            (('O', 10), ('O', 9), 'M', None), (('O', 8), ('O', 9), 'W', 'P'),
+        ]:
+            state.apply_move(*move)
+            self.assertEqual(state._compute_hash(), state.zobrist_hash)
+            self.assertEqual(state.zobrist_hash, state.clone().zobrist_hash)
+            hashes.add(state.zobrist_hash)
+        self.assertEqual(9, len(hashes))
+
+    def test_sideToMoveHash(self):
+        state = MatchState(TestBaseOpponent.DEFAULT_BLUE_BOARD)
+        other = MatchState(TestBaseOpponent.DEFAULT_BLUE_BOARD, turns=1)
+        self.assertEqual(state.get_hash(), other.get_hash())
+        self.assertNotEqual(state.zobrist_hash, other.zobrist_hash)
+
+
+class TestMatchStatePushPop(unittest.TestCase):
+
+    MOVES = [
+        (('O', 17), ('O', 0), 'W', 'P'), (('O', 1), ('O', 0), 'L', 'P'), (('O', 0), ('O', 1), 'M', None),
+        (('O', 2), ('O', 1), 'T', 'S'), (('O', 9), ('O', 8), 'L', 'R'), (('O', 7), ('I', 3), 'M', None),
+        (('O', 10), ('O', 9), 'M', None), (('O', 8), ('O', 9), 'W', 'P'),
+    ]
+
+    def test_pushMatchesApply(self):
+        state1 = MatchState(TestBaseOpponent.DEFAULT_BLUE_BOARD)
+        state2 = MatchState(TestBaseOpponent.DEFAULT_BLUE_BOARD)
+        for move in self.MOVES:
+            state1.apply_move(*move)
+            state2.push_move(*move)
+            self.assertEqual(state1._data, state2._data)
+            self.assertEqual(state1.zobrist_hash, state2.zobrist_hash)
+            self.assertEqual(state1.turns, state2.turns)
+
+    def test_popRestoresState(self):
+        state = MatchState(TestBaseOpponent.DEFAULT_BLUE_BOARD)
+        history = []
+        for move in self.MOVES:
+            history.append((bytes(state._data), state.zobrist_hash, state.turns))
+            state.push_move(*move)
+        while history:
+            state.pop_move()
+            self.assertEqual(history.pop(), (bytes(state._data), state.zobrist_hash, state.turns))
+        self.assertEqual(TestBaseOpponent.DEFAULT_BLUE_BOARD, state.snapshot())
+
+
+class TestMatchStateSplitMoves(unittest.TestCase):
+
+    def test_splitMatchesPossibleMoves(self):
+        state = MatchState(TestBaseOpponent.DEFAULT_BLUE_BOARD)
+        for player in 'PO':
+            moves, challenges = state.get_split_moves(player)
+            self.assertCountEqual(state.get_possible_moves(player), moves + [c[0] for c in challenges])
+            for move in moves:
+                self.assertEqual('0', state.get_board_value(*move[1]))
+            for move, from_piece, to_piece in challenges:
+                self.assertEqual(state.get_board_value(*move[0]), from_piece)
+                self.assertEqual(state.get_board_value(*move[1]), to_piece)
+        self.assertEqual([((('O', 0), ('O', 17)), 'PR', 'OU'), ((('O', 8), ('O', 9)), 'PS', 'OU')],
+                         state.get_split_moves('P')[1])
 
 
 class TestMatchStateMatchOver(unittest.TestCase):
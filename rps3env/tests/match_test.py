@@ -13,10 +13,11 @@
    See the License for the specific language governing permissions and
    limitations under the License.
 """
+import random
 import unittest
 from itertools import starmap
 
-from rps3env import classes
+from rps3env import classes, zobrist
 
 __author__ = 'Islam Elnabarawy'
 
@@ -173,6 +174,104 @@ class MatchTest(unittest.TestCase):
         self.assertIsNotNone(match_clone.board[0])
         self.assertIsNone(match_clone.board[18])
 
+    def get_snapshot(self):
+        return ([(p, p.revealed) if p is not None else None for p in self.match.board],
+                self.match._round[:], self.match.moves[:], self.match.game_over,
+                self.match.piece_counts(classes.PlayerColor.Blue), self.match.piece_counts(classes.PlayerColor.Red))
+
+    def test_piece_counts(self):
+        self.assertEqual((0, 0, 0), self.match.piece_counts(classes.PlayerColor.Blue))
+        self.setup_board()
+        self.assertEqual((3, 3, 3), self.match.piece_counts(classes.PlayerColor.Blue))
+        self.match.make_move(8, 9, classes.PlayerColor.Blue)
+        self.match.make_move(17, 0, classes.PlayerColor.Red)
+        self.assertEqual((2, 3, 3), self.match.piece_counts(classes.PlayerColor.Blue))
+        self.assertEqual((3, 3, 3), self.match.piece_counts(classes.PlayerColor.Red))
+        self.match.make_move(1, 18, classes.PlayerColor.Blue)
+        self.match.make_move(9, 22, classes.PlayerColor.Red)
+        self.match.make_move(2, 1, classes.PlayerColor.Blue)
+        self.match.make_move(22, 23, classes.PlayerColor.Red)
+        self.assertEqual((1, classes.PieceType.P), self.match.make_move(1, 0, classes.PlayerColor.Blue))
+        self.assertEqual((2, 3, 3), self.match.piece_counts(classes.PlayerColor.Blue))
+        self.assertEqual((3, 2, 3), self.match.piece_counts(classes.PlayerColor.Red))
+
+    def test_piece_counts_clone(self):
+        self.setup_board()
+        match_clone = self.match.clone()
+        self.match.make_move(0, 17, classes.PlayerColor.Blue)
+        self.assertEqual((2, 3, 3), self.match.piece_counts(classes.PlayerColor.Blue))
+        self.assertEqual((3, 3, 3), match_clone.piece_counts(classes.PlayerColor.Blue))
+
+    def test_push_pop_move(self):
+        self.setup_board()
+        before = self.get_snapshot()
+        self.assertEqual((0, classes.PieceType.S), self.match.push_move(8, 9))
+        self.assertTrue(self.match.board[8].revealed)
+        self.assertEqual((1, classes.PieceType.R), self.match.push_move(17, 0))
+        self.assertIsNone(self.match.board[17])
+        self.match.pop_move()
+        self.match.pop_move()
+        self.assertEqual(before, self.get_snapshot())
+
+    def test_push_pop_game_over(self):
+        self.setup_board()
+        move_sequence = [(8, 22), (11, 23), (22, 23), (14, 25), (23, 24), (25, 24), (24, 25), (17, 26), (0, 18),
+                         (26, 25)]
+        for move in move_sequence:
+            self.match.push_move(*move)
+        before = self.get_snapshot()
+        self.assertEqual((100, None), self.match.push_move(18, 27))
+        self.assertTrue(self.match.game_over)
+        self.match.pop_move()
+        self.assertEqual(before, self.get_snapshot())
+        self.assertFalse(self.match.game_over)
+
+    def test_push_pop_random_walk(self):
+        self.setup_board()
+        rng = random.Random(0)
+        snapshots = []
+        while not self.match.game_over:
+            snapshots.append(self.get_snapshot())
+            color, moves = self.match.get_possible_moves()
+            self.match.push_move(*rng.choice(moves))
+        while snapshots:
+            self.match.pop_move()
+            self.assertEqual(snapshots.pop(), self.get_snapshot())
+
+    def get_expected_hash(self):
+        result = zobrist.SIDE_TO_MOVE if self.match._get_turn() == classes.PlayerColor.Red else 0
+        for i, p in enumerate(self.match.board):
+            if p is not None:
+                result ^= zobrist.MATCH_PIECES[i][p.color.value][p.piece_type.value][p.revealed]
+        return result
+
+    def test_zobrist_hash(self):
+        self.assertEqual(0, self.match.zobrist_hash)
+        self.setup_board()
+        rng = random.Random(1)
+        hashes = [self.match.zobrist_hash]
+        while not self.match.game_over:
+            color, moves = self.match.get_possible_moves()
+            self.match.push_move(*rng.choice(moves))
+            self.assertEqual(self.get_expected_hash(), self.match.zobrist_hash)
+            self.assertEqual(self.match.zobrist_hash, self.match.clone().zobrist_hash)
+            hashes.append(self.match.zobrist_hash)
+        while len(hashes) > 1:
+            self.assertEqual(hashes.pop(), self.match.zobrist_hash)
+            self.match.pop_move()
+        self.assertEqual(hashes.pop(), self.match.zobrist_hash)
+
+    def test_zobrist_hash_transposition(self):
+        self.setup_board()
+        other = self.match.clone()
+        for move in [(0, 18), (9, 22), (2, 19), (22, 23)]:
+            self.match.push_move(*move)
+        for move in [(2, 19), (9, 22), (0, 18), (22, 23)]:
+            other.push_move(*move)
+        self.assertEqual(self.match.zobrist_hash, other.zobrist_hash)
+        other.push_move(18, 0)
+        self.assertNotEqual(self.match.zobrist_hash, other.zobrist_hash)
+
     def test_possible_moves(self):
         self.setup_board()
 
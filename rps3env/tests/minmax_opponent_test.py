@@ -13,11 +13,52 @@
    See the License for the specific language governing permissions and
    limitations under the License.
 """
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+from rps3env.envs import RPS3GameMinMaxEnv
 from rps3env.opponents import MinMaxOpponent
+from rps3env.opponents.match_state import MatchState
+from rps3env.opponents.search_stats import SearchStatsAggregator
+from rps3env.opponents.search_trace import CUTOFF, ITERATION, NODE, RESULT
 from rps3env.tests.base_opponent_test import TestBaseOpponent
 
 __author__ = 'Islam Elnabarawy'
 
+OPPONENT_MOVE = {'from': 'O9', 'to': 'I4', 'outcome': 'M'}
+TIED_CHALLENGE = {'from': 'O0', 'to': 'O17', 'outcome': 'T', 'otherHand': 'R'}
+
+
+def get_game_states(seed, every=3):
+    """
+    :return: The opponent's MatchState at every few rounds of a game of random moves against a depth 1 MinMax
+    """
+    env = RPS3GameMinMaxEnv(depth_limit=1)
+    env.seed(seed)
+    env.reset()
+    rng = random.Random(seed)
+    states = []
+    done = False
+    while not done:
+        obs, reward, done, info = env.step(rng.choice(env.available_actions))
+        if not done and info['round'] % every == 0 and not env._opponent._state.is_match_over()[0]:
+            states.append(env._opponent.get_state())
+    return states
+
+
+def count_game_nodes(depth_limit, seeds=(0, 1), **kwargs):
+    """
+    :return: The nodes one opponent visits searching the states of get_game_states for each seed, in order
+    """
+    opponent = MinMaxOpponent(depth_limit, **kwargs)
+    nodes = 0
+    for seed in seeds:
+        for state in get_game_states(seed):
+            opponent.set_state(state)
+            opponent.get_next_move()
+            nodes += opponent.last_search_stats.nodes
+    return nodes
+
 
 class TestMinMaxOpponentLegalNextMove(TestBaseOpponent):
 
@@ -34,7 +75,27 @@ class TestMinMaxOpponentLegalNextMove(TestBaseOpponent):
         self.assertIn(move, self.POSSIBLE_GREEN_MOVES)
 
 
-class TestMinMaxOpponentNextMove(TestBaseOpponent):
+class TestMinMaxOpponentSearch(TestBaseOpponent):
+    MOVES = [OPPONENT_MOVE]
+
+    def get_opponent(self, cls=MinMaxOpponent, layout=None, moves=None, **kwargs):
+        opponent = cls(**kwargs)
+        opponent.init_board_layout(0, layout or ['R', 'P', 'S'] * 3)
+        for move in self.MOVES if moves is None else moves:
+            opponent.apply_move(move)
+        return opponent
+
+    def get_next_move(self, opponent):
+        """
+        Search for the opponent's next move, checking that the search leaves its state the way it found it
+        """
+        before = opponent.print_board(output=False), opponent._state.zobrist_hash
+        move = opponent.get_next_move()
+        self.assertEqual(before, (opponent.print_board(output=False), opponent._state.zobrist_hash))
+        return move
+
+
+class TestMinMaxOpponentNextMove(TestMinMaxOpponentSearch):
 
     def test_minMaxSingleLevelBlueMove(self):
         opponent = MinMaxOpponent(1)
@@ -50,6 +111,336 @@ class TestMinMaxOpponentNextMove(TestBaseOpponent):
         move = opponent.get_next_move()
         self.assertEqual('O0:O17', move)
 
+    def test_minMaxNextMoveIdx(self):
+        opponent = MinMaxOpponent(2)
+        layout = ['R', 'P', 'S'] * 3
+        opponent.init_board_layout(0, layout)
+        self.assertEqual((0, 17), opponent.next_move_idx())
+
+    def test_minMaxSearchLeavesStateUnchanged(self):
+        opponent = self.get_opponent(depth_limit=3, moves=[TIED_CHALLENGE])
+        self.assertIn(self.get_next_move(opponent), opponent.get_possible_moves('P'))
+
+
+class TestMinMaxOpponentTranspositionTable(TestMinMaxOpponentSearch):
+
+    class CountingOpponent(MinMaxOpponent):
+        nodes = 0
+
+        def get_next_val(self, *args, **kwargs):
+            self.nodes += 1
+            return super().get_next_val(*args, **kwargs)
+
+    def get_counting_opponent(self, tt_size):
+        return self.get_opponent(self.CountingOpponent, depth_limit=4, tt_size=tt_size)
+
+    def test_transpositionTableLegalMove(self):
+        opponent = self.get_counting_opponent(1 << 12)
+        self.assertIn(opponent.get_next_move(), opponent.get_possible_moves('P'))
+        self.assertGreater(opponent.transposition_table.hits, 0)
+
+    def test_transpositionTableFewerNodes(self):
+        opponent1 = self.get_counting_opponent(None)
+        opponent2 = self.get_counting_opponent(1 << 12)
+        opponent1.get_next_move()
+        opponent2.get_next_move()
+        self.assertIsNone(opponent1.transposition_table)
+        self.assertLess(opponent2.nodes, opponent1.nodes)
+
+    def test_searchSettings(self):
+        self.assertIsNone(MinMaxOpponent().search_settings['tt_size'])
+        self.assertEqual(1000, MinMaxOpponent(tt_size=1000).search_settings['tt_size'])
+
+
+class TestMinMaxOpponentHistoryTable(TestBaseOpponent):
+
+    def test_historyTableBounded(self):
+        opponent = MinMaxOpponent(3, history_size=16)
+        opponent.init_board_layout(0, ['R', 'P', 'S'] * 3)
+        self.assertIn(opponent.get_next_move(), opponent.get_possible_moves('P'))
+        self.assertEqual(16, len(opponent.history_table))
+        self.assertGreater(opponent.history_table.evictions, 0)
+
+
+class TestMinMaxOpponentBudgets(TestMinMaxOpponentSearch):
+
+    def test_searchStats(self):
+        opponent = self.get_opponent(depth_limit=2)
+        opponent.get_next_move()
+        stats = opponent.last_search_stats
+        self.assertEqual(2, stats.depth)
+        self.assertGreater(stats.nodes, 0)
+        self.assertGreaterEqual(stats.time_ms, 0)
+        self.assertFalse(stats.budget_exhausted)
+
+    def test_searchStatsCounters(self):
+        aggregator = SearchStatsAggregator()
+        opponent = self.get_opponent(depth_limit=3, tt_size=1 << 10, stats_aggregator=aggregator)
+        opponent.get_next_move()
+        stats = opponent.last_search_stats
+        self.assertEqual(3, len(stats.iteration_nodes))
+        self.assertEqual(3, len(stats.iteration_time_ms))
+        self.assertEqual(stats.nodes, sum(stats.iteration_nodes))
+        self.assertGreater(stats.cutoffs, 0)
+        self.assertGreater(stats.tt_probes, 0)
+        self.assertLessEqual(stats.tt_hits, stats.tt_probes)
+        self.assertGreater(stats.history_probes, 0)
+        self.assertLessEqual(stats.history_hits, stats.history_probes)
+        self.assertGreater(stats.branching_factor, 1)
+        self.assertEqual([stats], aggregator._stats)
+
+    def test_searchStatsUnfinishedIteration(self):
+        opponent = self.get_opponent(depth_limit=8, node_budget=2000)
+        opponent.get_next_move()
+        stats = opponent.last_search_stats
+        self.assertEqual(stats.depth + 1, len(stats.iteration_nodes))
+        self.assertEqual(2000, sum(stats.iteration_nodes))
+
+    def test_nodeBudget(self):
+        opponent = self.get_opponent(depth_limit=8, node_budget=2000)
+        move = self.get_next_move(opponent)
+        stats = opponent.last_search_stats
+        self.assertIn(move, opponent.get_possible_moves('P'))
+        self.assertTrue(stats.budget_exhausted)
+        self.assertLess(stats.depth, 8)
+        self.assertEqual(2000, stats.nodes)
+
+    def test_nodeBudgetKeepsLastIteration(self):
+        budgeted = self.get_opponent(depth_limit=8, node_budget=2000)
+        move = budgeted.get_next_move()
+        opponent = self.get_opponent(depth_limit=budgeted.last_search_stats.depth)
+        self.assertEqual(move, opponent.get_next_move())
+
+    def test_timeBudget(self):
+        opponent = self.get_opponent(depth_limit=20, time_budget_ms=50)
+        self.assertIn(opponent.get_next_move(), opponent.get_possible_moves('P'))
+        self.assertTrue(opponent.last_search_stats.budget_exhausted)
+        self.assertLess(opponent.last_search_stats.time_ms, 1000)
+
+    def test_budgetNeedsIterativeDeepening(self):
+        with self.assertRaises(ValueError):
+            MinMaxOpponent(iterative=False, node_budget=2000)
+        with self.assertRaises(ValueError):
+            MinMaxOpponent(iterative=False, time_budget_ms=50)
+
+    def test_firstIterationAlwaysCompletes(self):
+        opponent = self.get_opponent(depth_limit=4, node_budget=1)
+        self.assertIn(opponent.get_next_move(), opponent.get_possible_moves('P'))
+        self.assertEqual(1, opponent.last_search_stats.depth)
+
+
+class TestMinMaxOpponentTracer(TestMinMaxOpponentSearch):
+
+    def test_tracerEvents(self):
+        events = []
+        opponent = self.get_opponent(depth_limit=3, tracer=events.append)
+        move = opponent.get_next_move()
+        self.assertEqual(move, self.get_opponent(depth_limit=3).get_next_move())
+        kinds = [e.kind for e in events]
+        self.assertEqual(opponent.last_search_stats.nodes, kinds.count(NODE))
+        self.assertEqual(opponent.last_search_stats.cutoffs, kinds.count(CUTOFF))
+        iterations = [e for e in events if e.kind == ITERATION]
+        self.assertEqual([1, 2, 3], [e.depth for e in iterations])
+        self.assertEqual(move, opponent.get_move_code(iterations[-1].move))
+        root = [e for e in events if e.kind == RESULT and e.ply == 0]
+        self.assertEqual(iterations[-1].move, root[-1].move)
+        self.assertTrue(all(e.ply > 0 for e in events if e.kind == CUTOFF))
+
+
+class TestMinMaxOpponentMoveOrdering(TestMinMaxOpponentSearch):
+    # a player's R at I0 next to a known S, a known P and an unknown piece, with two empty cells to move to
+    BOARD = {
+        'O': ['OU'] + ['0'] * 17,
+        'I': ['PR', 'OS'] + ['0'] * 6 + ['OP'],
+        'C': ['0']
+    }
+    WINNING = (('I', 0), ('I', 1))
+    UNKNOWN = (('I', 0), ('O', 0))
+    QUIET = [(('I', 0), ('O', 1)), (('I', 0), ('C', 0))]
+    LOSING = (('I', 0), ('I', 8))
+
+    def get_ordered_moves(self, opponent):
+        state = MatchState(self.BOARD, opponent_counts=[1, 2, 1, 5], player_counts=[1, 0, 0], player_reveals=[0] * 3)
+        return opponent._get_ordered_moves(state, True, None, 0)[0]
+
+    def test_orderingPipeline(self):
+        opponent = MinMaxOpponent(move_ordering=True)
+        self.assertEqual([self.WINNING, self.UNKNOWN] + self.QUIET + [self.LOSING], self.get_ordered_moves(opponent))
+
+    def test_killersAndButterfly(self):
+        opponent = MinMaxOpponent(move_ordering=True)
+        opponent._butterfly[self.QUIET[1]] = 4
+        self.assertEqual([self.QUIET[1], self.QUIET[0]], self.get_ordered_moves(opponent)[2:4])
+        opponent._killers = [[self.QUIET[0]]]
+        self.assertEqual(self.QUIET, self.get_ordered_moves(opponent)[2:4])
+
+    def test_orderingSearch(self):
+        opponent = self.get_opponent(depth_limit=3, move_ordering=True)
+        self.assertIn(self.get_next_move(opponent), opponent.get_possible_moves('P'))
+        self.assertTrue(any(opponent._killers))
+        self.assertTrue(any(opponent._butterfly.values()))
+        self.assertTrue(opponent.search_settings['move_ordering'])
+
+    def test_fewerNodes(self):
+        self.assertLess(count_game_nodes(4, move_ordering=True), count_game_nodes(4))
+
+    def test_sameRootValue(self):
+        # the order only changes the speed when chance node values do not depend on it
+        for seed in range(2):
+            for state in get_game_states(seed):
+                unordered, ordered = (MinMaxOpponent(4, exact_chance=True, move_ordering=move_ordering)
+                                      for move_ordering in (False, True))
+                unordered.set_state(state.clone())
+                ordered.set_state(state)
+                self.assertEqual(unordered.get_next_move(), ordered.get_next_move())
+                self.assertAlmostEqual(unordered._root_value, ordered._root_value)
+
+
+def expectimax(opponent, state, depth, get_max):
+    """
+    The value get_next_val() should find for a state, searched without any pruning
+    """
+    prob_match_over, winner = state.is_match_over()
+    if prob_match_over > 0.0:
+        match_score = 3 + 9 - state.num_captures if winner == 'P' else -sum(state.counts)
+        return 10 * match_score * prob_match_over
+    if depth == 0:
+        return opponent.get_state_heuristic(state)
+    values = []
+    for move in state.get_possible_moves('P' if get_max else 'O'):
+        piece1 = state.get_board_value(*move[0])[1]
+        to_piece = state.get_board_value(*move[1])
+        if to_piece == '0':
+            outcomes = [(1.0, 'M', None)]
+        elif (to_piece[1] if get_max else piece1) != 'U':
+            outcomes = [(1.0, opponent.get_challenge_outcome(piece1, to_piece[1]), to_piece[1] if get_max else piece1)]
+        else:
+            outcomes = []
+            for probability, piece in zip(state.get_opponent_piece_probabilities(), state.PIECE_KEY):
+                if probability > 0:
+                    challenge = (piece1, piece) if get_max else (piece, to_piece[1])
+                    outcomes.append((probability, opponent.get_challenge_outcome(*challenge), piece))
+        value = 0
+        for probability, outcome, other_hand in outcomes:
+            state.push_move(move[0], move[1], outcome, other_hand)
+            value += probability * expectimax(opponent, state, depth - 1, not get_max)
+            state.pop_move()
+        values.append(value)
+    return max(values) if get_max else min(values)
+
+
+class TestMinMaxOpponentPrincipalVariationSearch(TestMinMaxOpponentSearch):
+    MOVES = [OPPONENT_MOVE, TIED_CHALLENGE]
+
+    def test_offByDefault(self):
+        settings = MinMaxOpponent().search_settings
+        self.assertFalse(settings['pvs'])
+        self.assertIsNone(settings['aspiration_window'])
+
+    def test_needsTables(self):
+        with self.assertRaises(ValueError):
+            MinMaxOpponent(pvs=True)
+        with self.assertRaises(ValueError):
+            MinMaxOpponent(move_ordering=True, aspiration_window=3)
+        with self.assertRaises(ValueError):
+            MinMaxOpponent(tt_size=1 << 12, aspiration_window=3)
+
+    def test_fewerNodes(self):
+        self.assertLess(count_game_nodes(4, move_ordering=True, pvs=True), count_game_nodes(4, move_ordering=True))
+        self.assertLess(count_game_nodes(4, tt_size=1 << 12, move_ordering=True, pvs=True),
+                        count_game_nodes(4, tt_size=1 << 12, move_ordering=True))
+
+    def test_aspirationWindowFewerNodes(self):
+        self.assertLess(count_game_nodes(4, tt_size=1 << 12, move_ordering=True, aspiration_window=3),
+                        count_game_nodes(4, tt_size=1 << 12, move_ordering=True))
+
+    def test_exactRootValue(self):
+        opponent = self.get_opponent(depth_limit=3, move_ordering=True, pvs=True, exact_chance=True)
+        self.assertIn(self.get_next_move(opponent), opponent.get_possible_moves('P'))
+        self.assertAlmostEqual(expectimax(opponent, opponent._state, 3, True), opponent._root_value)
+
+    def test_aspirationWindow(self):
+        opponent = self.get_opponent(depth_limit=3, tt_size=1 << 12, move_ordering=True, pvs=True,
+                                     aspiration_window=0.5, exact_chance=True)
+        self.assertIn(opponent.get_next_move(), opponent.get_possible_moves('P'))
+        self.assertAlmostEqual(expectimax(opponent, opponent._state, 3, True), opponent._root_value)
+        self.assertEqual(0.5, opponent.search_settings['aspiration_window'])
+
+    def test_chanceNodeBounds(self):
+        opponent = self.get_opponent(exact_chance=True)
+        state = opponent._state
+        moves = [move for move, piece, other in state.get_split_moves('P')[1] if other == 'OU']
+        self.assertTrue(moves)
+        for move in moves:
+            exact, pruned = opponent.get_move_value(state, move, 2, True, -1000, 1000)
+            self.assertFalse(pruned)
+            for alpha, beta in ((exact - 5, exact - 4), (exact + 4, exact + 5), (exact - 1, exact + 1)):
+                # outside of the window, the value is only a bound on the expected value, but on the right side
+                value, pruned = opponent.get_move_value(state, move, 2, True, alpha, beta)
+                if value >= beta:
+                    self.assertGreaterEqual(exact + 1e-9, value)
+                elif value <= alpha:
+                    self.assertLessEqual(exact - 1e-9, value)
+                else:
+                    self.assertAlmostEqual(exact, value)
+
+
+class TestMinMaxOpponentParallelSearch(TestMinMaxOpponentSearch):
+    MOVES = [OPPONENT_MOVE, TIED_CHALLENGE]
+
+    def test_sameMoveAsSerial(self):
+        opponent = self.get_opponent(depth_limit=3, search_workers=2, exact_chance=True)
+        try:
+            move = self.get_next_move(opponent)
+            self.assertEqual(self.get_opponent(depth_limit=3, exact_chance=True).get_next_move(), move)
+            self.assertEqual(3, opponent.last_search_stats.depth)
+        finally:
+            opponent.close()
+
+    def test_needsExactChance(self):
+        with self.assertRaises(ValueError):
+            MinMaxOpponent(search_workers=2)
+        self.assertTrue(MinMaxOpponent(search_workers=2, exact_chance=True).exact_chance)
+
+    def test_sameMovesAsSerialGame(self):
+        self.assert_same_moves_as_serial(4)
+
+    def test_sameMovesAsSerialGameWithTables(self):
+        self.assert_same_moves_as_serial(4, tt_size=1 << 12, move_ordering=True, pvs=True)
+
+    def assert_same_moves_as_serial(self, depth_limit, **kwargs):
+        """
+        Search every few states of two games with a serial and a parallel opponent, each keeping its tables from one
+        state to the next like it would over a game
+        """
+        pool = ProcessPoolExecutor(2)
+        try:
+            for seed in range(2):
+                serial, parallel = (
+                    MinMaxOpponent(depth_limit, exact_chance=True, search_workers=search_workers, search_pool=pool,
+                                   **kwargs)
+                    for search_workers in (None, 2)
+                )
+                states = get_game_states(seed)
+                self.assertGreater(len(states), 5)
+                for state in states:
+                    serial.set_state(state.clone())
+                    parallel.set_state(state)
+                    self.assertEqual(serial.get_next_move(), parallel.get_next_move())
+                parallel.close()
+                self.assertIsNotNone(pool.submit(abs, -1).result())
+        finally:
+            pool.shutdown()
+
+    def test_nodeBudget(self):
+        opponent = self.get_opponent(depth_limit=8, node_budget=3000, search_workers=2, exact_chance=True)
+        try:
+            self.assertIn(opponent.get_next_move(), opponent.get_possible_moves('P'))
+            self.assertTrue(opponent.last_search_stats.budget_exhausted)
+            self.assertLess(opponent.last_search_stats.depth, 8)
+        finally:
+            opponent.close()
+
 
 class TestMinMaxOpponentLegalBoardLayout(TestBaseOpponent):
 
@@ -0,0 +1,172 @@
+"""
+   Copyright 2019 Islam Elnabarawy
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+import gc
+import pickle
+import random
+import unittest
+
+from rps3env.envs import RPS3GameMinMaxEnv, RPS3VectorMinMaxEnv
+from rps3env.opponents import MinMaxOpponent, OpponentService, RandomOpponent
+from rps3env.topology import LABELS
+
+__author__ = 'Islam Elnabarawy'
+
+
+def get_opponent(cls=MinMaxOpponent, **kwargs):
+    opponent = cls(**kwargs)
+    opponent.init_board_layout(0, ['R', 'P', 'S'] * 3)
+    opponent.apply_move({'from': 'O9', 'to': 'I4', 'outcome': 'M'})
+    return opponent
+
+
+def play(env, seed):
+    env.seed(seed)
+    env.reset()
+    rng = random.Random(seed)
+    done = False
+    rewards = []
+    while not done:
+        obs, reward, done, info = env.step(rng.choice(env.available_actions))
+        rewards.append(reward)
+    return rewards
+
+
+class OpponentServiceTest(unittest.TestCase):
+
+    def test_unknownBackend(self):
+        with self.assertRaises(ValueError):
+            OpponentService(backend='threads')
+
+    def test_inlineBackend(self):
+        service = OpponentService(backend='inline', batch_size=2)
+        opponents = [get_opponent(depth_limit=2), get_opponent(depth_limit=3), get_opponent(RandomOpponent)]
+        futures = [service.submit(opponent) for opponent in opponents]
+        # the first batch is searched as soon as it is full
+        self.assertTrue(futures[0].done())
+        self.assertFalse(futures[2].done())
+        service.flush()
+        self.assertEqual(get_opponent(depth_limit=2).next_move_idx(), futures[0].result())
+        self.assertEqual(get_opponent(depth_limit=3).next_move_idx(), futures[1].result())
+        move = futures[2].result()
+        self.assertIn('%s:%s' % (LABELS[move[0]], LABELS[move[1]]), opponents[2].get_possible_moves('P'))
+        service.close()
+
+    def test_processBackend(self):
+        service = OpponentService(num_workers=2, batch_size=2)
+        try:
+            opponents = [get_opponent(depth_limit=depth) for depth in (1, 2, 3, 2, 1)]
+            futures = [service.submit(opponent) for opponent in opponents]
+            service.flush()
+            for opponent, future in zip(opponents, futures):
+                self.assertEqual(get_opponent(**opponent.search_settings).next_move_idx(), future.result())
+                self.assertEqual(opponent.depth_limit, opponent.last_search_stats.depth)
+        finally:
+            service.close()
+
+    def test_tablesStayInWorker(self):
+        service = OpponentService(num_workers=2, batch_size=4)
+        try:
+            opponent = get_opponent(depth_limit=3, tt_size=1 << 12, move_ordering=True)
+            expected = get_opponent(depth_limit=3, tt_size=1 << 12, move_ordering=True)
+            moves = [{'from': 'I4', 'to': 'O9', 'outcome': 'M'}, {'from': 'O9', 'to': 'I4', 'outcome': 'M'}]
+            for i, move in enumerate(moves):
+                future = service.submit(opponent)
+                # only the first decision sends the settings, and none of them send the tables
+                request = service._queue[-1][2][1]
+                self.assertEqual(i == 0, request[1] is not None)
+                self.assertLess(len(pickle.dumps(request)), 2000)
+                service.flush()
+                self.assertEqual(expected.next_move_idx(), future.result())
+                # the worker's copy found the tables of its first search in the second one, like expected did
+                self.assertEqual(expected.last_search_stats.tt_hits, opponent.last_search_stats.tt_hits)
+                self.assertEqual(expected.last_search_stats.nodes, opponent.last_search_stats.nodes)
+                self.assertEqual(0, opponent.transposition_table.probes)
+                opponent.apply_move(move)
+                expected.apply_move(move)
+        finally:
+            service.close()
+
+
+    def test_forgetsCollectedOpponents(self):
+        service = OpponentService(num_workers=1, batch_size=4)
+        try:
+            opponent = get_opponent(depth_limit=1)
+            future = service.submit(opponent)
+            service.flush()
+            self.assertIsNotNone(future.result())
+            del opponent
+            gc.collect()
+            self.assertEqual([[0]], service._forgotten)
+            # the next batch sent to the worker takes the key along
+            other = get_opponent(depth_limit=1)
+            future = service.submit(other)
+            service.flush()
+            self.assertEqual([[]], service._forgotten)
+            self.assertEqual(other.next_move_idx(), future.result())
+        finally:
+            service.close()
+
+
+class OpponentServiceEnvTest(unittest.TestCase):
+
+    def test_inlineServiceMatchesSerialGame(self):
+        env = RPS3GameMinMaxEnv(depth_limit=2)
+        service_env = RPS3GameMinMaxEnv(depth_limit=2, opponent_service=OpponentService(backend='inline'))
+        self.assertEqual(play(env, 3), play(service_env, 3))
+
+    def test_processServiceMatchesSerialGame(self):
+        service = OpponentService(num_workers=2)
+        try:
+            for seed in range(6):
+                env = RPS3GameMinMaxEnv(depth_limit=3)
+                service_env = RPS3GameMinMaxEnv(depth_limit=3, opponent_service=service)
+                self.assertEqual(play(env, seed), play(service_env, seed))
+        finally:
+            service.close()
+
+    def test_stepAsync(self):
+        service = OpponentService(num_workers=2)
+        envs = [RPS3GameMinMaxEnv(depth_limit=2, opponent_service=service) for _ in range(3)]
+        try:
+            rng = random.Random(0)
+            for env in envs:
+                env.reset()
+                env.step(rng.choice(env.available_actions))
+            for _ in range(5):
+                for env in envs:
+                    env.step_async(rng.choice(env.available_actions))
+                for env in envs:
+                    obs, reward, done, info = env.step_wait()
+                    self.assertIsNotNone(info['opponent_move'])
+                    if done:
+                        env.reset()
+                        env.step(rng.choice(env.available_actions))
+        finally:
+            service.close()
+
+    def test_vectorEnv(self):
+        service = OpponentService(num_workers=2)
+        env = RPS3VectorMinMaxEnv(4, opponent_service=service, depth_limit=2)
+        try:
+            env.seed(1)
+            env.reset()
+            rng = random.Random(1)
+            for _ in range(10):
+                actions = [rng.choice(mask.nonzero()[0].tolist()) for mask in env.action_mask()]
+                env.step(actions)
+                self.assertTrue(env.action_mask().any(axis=1).all())
+        finally:
+            service.close()
@@ -13,7 +13,10 @@
    See the License for the specific language governing permissions and
    limitations under the License.
 """
+import random
+
 from rps3env.opponents import RandomOpponent
+from rps3env.topology import LABEL_INDEX
 from rps3env.tests.base_opponent_test import TestBaseOpponent
 
 __author__ = 'Islam Elnabarawy'
@@ -54,3 +57,17 @@ class TestRandomOpponent(TestBaseOpponent):
         opponent.init_board_layout(0)
         hand = opponent.get_player_hand()
         self.assertIn(hand, ['R', 'P', 'S'])
+
+    def test_sharedRng(self):
+        opponents = [RandomOpponent(rng=random.Random(7)) for _ in range(2)]
+        layouts = [opponent.init_board_layout(1) for opponent in opponents]
+        self.assertEqual(layouts[0], layouts[1])
+        self.assertEqual(opponents[0].get_next_move(), opponents[1].get_next_move())
+
+    def test_nextMoveIdx(self):
+        opponents = [RandomOpponent(rng=random.Random(3)) for _ in range(2)]
+        for opponent in opponents:
+            opponent.init_board_layout(1)
+        for _ in range(5):
+            move = opponents[0].get_next_move()
+            self.assertEqual(tuple(LABEL_INDEX[label] for label in move.split(':')), opponents[1].next_move_idx())
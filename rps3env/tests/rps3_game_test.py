@@ -19,10 +19,14 @@ import sys
 import unittest
 
 import gym
+import numpy as np
 from gym import Space, spaces
 
 import rps3env.config
+from rps3env import topology
 from rps3env.envs import RPS3GameEnv, RPS3GameMinMaxEnv
+from rps3env.envs.rps3_game import get_setup_layouts, action_to_layout, layout_to_action, NUM_SETUP_LAYOUTS, \
+    ARRAY_OBS_SIZE, action_to_edge, edge_to_action
 from rps3env.tests.utils import captured_output
 
 __author__ = 'Islam Elnabarawy'
@@ -274,6 +278,20 @@ class RPS3GameEnvTest(unittest.TestCase):
         obs, reward, done, info = self.init_board()
         self.step_assert(obs, reward, done, info, OBS_AFTER_BOARD_INIT)
 
+    def test_seed_is_per_env(self):
+        state = random.getstate()
+        envs = [RPS3GameEnv(), RPS3GameEnv()]
+        for env in envs:
+            env.seed(5)
+            env.reset()
+        # interleave the two envs, they should still play the same game
+        results = [[], []]
+        for move in [[1, 2, 3] * 3, (0, 18), (18, 27), (8, 9)]:
+            for k, env in enumerate(envs):
+                results[k].append(env.step(move))
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(state, random.getstate())
+
     def test_render_set_board(self):
         self.env.seed(0)
         self.init_board()
@@ -314,7 +332,8 @@ class RPS3GameEnvTest(unittest.TestCase):
         available_actions = self.env.available_actions
         random.seed(0)
         self.assertIsInstance(random.choice(available_actions), list)
-        self.assertEqual(362880, len(available_actions))
+        self.assertEqual(1680, len(available_actions))
+        self.assertEqual(len(available_actions), len(set(tuple(x) for x in available_actions)))
 
     def test_game_available_actions(self):
         self.init_board()
@@ -413,6 +432,142 @@ class RPS3GameEnvTest(unittest.TestCase):
                          reward_expected=[-101, 0], done_expected=True, info_expected={'round': len(moves) + 1})
 
 
+class SetupLayoutsTest(unittest.TestCase):
+    def test_setup_layouts(self):
+        layouts = get_setup_layouts()
+        self.assertIs(layouts, get_setup_layouts())
+        self.assertEqual(NUM_SETUP_LAYOUTS, len(layouts))
+        self.assertEqual(NUM_SETUP_LAYOUTS, len(set(layouts)))
+        self.assertEqual(list(layouts), sorted(layouts))
+        for layout in layouts:
+            self.assertEqual(3, layout.count(1))
+            self.assertEqual(3, layout.count(2))
+            self.assertEqual(3, layout.count(3))
+
+    def test_layout_encoding(self):
+        for action in [0, 1, 839, NUM_SETUP_LAYOUTS - 1]:
+            layout = action_to_layout(action)
+            self.assertIsInstance(layout, list)
+            self.assertEqual(action, layout_to_action(layout))
+        self.assertEqual([1, 1, 1, 2, 2, 2, 3, 3, 3], action_to_layout(0))
+        self.assertEqual([3, 3, 3, 2, 2, 2, 1, 1, 1], action_to_layout(NUM_SETUP_LAYOUTS - 1))
+
+    def test_discrete_setup(self):
+        env = RPS3GameEnv(discrete_setup=True)
+        env.seed(0)
+        env.reset()
+        self.assertIsInstance(env.action_space, spaces.Discrete)
+        self.assertEqual(NUM_SETUP_LAYOUTS, env.action_space.n)
+        self.assertEqual(list(range(NUM_SETUP_LAYOUTS)), env.available_actions)
+        obs, reward, done, info = env.step(layout_to_action([1, 2, 3] * 3))
+        self.assertEqual(OBS_AFTER_BOARD_INIT, obs)
+        self.assertEqual(2, env.action_space.shape[0])
+
+
+class ArrayObservationTest(unittest.TestCase):
+    def assert_same_observation(self, expected, actual, views):
+        self.assertTrue(np.shares_memory(actual, views['occupied']))
+        for name, value in expected.items():
+            self.assertListEqual([int(x) for x in value], views[name].tolist())
+
+    def test_array_observation(self):
+        for bitboard in (False, True):
+            env = RPS3GameEnv(bitboard=bitboard, array_obs=True)
+            expected_env = RPS3GameEnv()
+            for seed in range(5):
+                rng = random.Random(seed)
+                env.seed(seed)
+                expected_env.seed(seed)
+                obs = env.reset()
+                self.assertEqual((ARRAY_OBS_SIZE,), obs.shape)
+                self.assertEqual(np.int8, obs.dtype)
+                self.assertTrue(env.observation_space.contains(obs))
+                self.assert_same_observation(expected_env.reset(), obs, env.observation_views)
+                done = False
+                while not done:
+                    action = rng.choice(env.available_actions)
+                    obs, reward, done, info = env.step(action)
+                    expected = expected_env.step(action)
+                    self.assertEqual(expected[1:], (reward, done, info))
+                    self.assertTrue(env.observation_space.contains(obs))
+                    self.assert_same_observation(expected[0], obs, env.observation_views)
+
+    def test_default_observation(self):
+        env = RPS3GameEnv()
+        self.assertIsNone(env.observation_views)
+        self.assertIsInstance(env.observation_space, spaces.Dict)
+
+
+class ActionMaskTest(unittest.TestCase):
+    def test_uninitialized(self):
+        env = RPS3GameEnv()
+        self.assertRaises(ValueError, lambda: env.action_mask())
+
+    def test_action_mask(self):
+        for bitboard in (False, True):
+            env = RPS3GameEnv(bitboard=bitboard)
+            for seed in range(5):
+                rng = random.Random(seed)
+                env.seed(seed)
+                env.reset()
+                mask = env.action_mask()
+                self.assertEqual((NUM_SETUP_LAYOUTS,), mask.shape)
+                self.assertTrue(mask.all())
+                done = False
+                while not done:
+                    action = rng.choice(env.available_actions)
+                    obs, reward, done, info = env.step(action)
+                    if done:
+                        self.assertRaises(ValueError, lambda: env.action_mask())
+                        break
+                    # skip some steps, so that some of the updates span more than one step
+                    if rng.random() < 0.5:
+                        continue
+                    expected = [False] * topology.NUM_EDGES
+                    for move in env.available_actions:
+                        expected[topology.EDGE_INDEX[move]] = True
+                    self.assertListEqual(expected, env.action_mask().tolist())
+
+
+class DiscreteMovesTest(unittest.TestCase):
+    def test_edge_encoding(self):
+        for edge in range(topology.NUM_EDGES):
+            self.assertEqual(edge, action_to_edge(edge_to_action(edge)))
+        self.assertEqual((0, 1), edge_to_action(0))
+        self.assertEqual(topology.EDGE_INDEX[(18, 27)], action_to_edge([18, 27]))
+        self.assertRaises(KeyError, lambda: action_to_edge((0, 2)))
+
+    def test_discrete_moves(self):
+        env = RPS3GameEnv(discrete_moves=True)
+        expected_env = RPS3GameEnv()
+        for seed in range(3):
+            rng = random.Random(seed)
+            env.seed(seed)
+            expected_env.seed(seed)
+            env.reset()
+            expected_env.reset()
+            env.step([1, 2, 3] * 3)
+            expected_env.step([1, 2, 3] * 3)
+            self.assertIsInstance(env.action_space, spaces.Discrete)
+            self.assertEqual(topology.NUM_EDGES, env.action_space.n)
+            done = False
+            while not done:
+                actions = env.available_actions
+                self.assertListEqual([action_to_edge(move) for move in expected_env.available_actions], actions)
+                action = rng.choice(actions)
+                obs, reward, done, info = env.step(action)
+                self.assertEqual(expected_env.step(edge_to_action(action)), (obs, reward, done, info))
+        env.reset()
+        env.step([1, 2, 3] * 3)
+        self.assertRaises(IndexError, lambda: env.step(topology.NUM_EDGES))
+        self.assertRaises(AssertionError, lambda: env.step(action_to_edge((0, 1))))
+
+
+class RPS3GameEnvBitboardTest(RPS3GameEnvTest):
+    def setUp(self):
+        self.env = RPS3GameEnv(bitboard=True)
+
+
 class RPS3GameMinMaxEnvTest(unittest.TestCase):
     def setUp(self):
         self.env = gym.make('RPS3Game-v1')  # type: RPS3GameMinMaxEnv
@@ -421,41 +576,67 @@ class RPS3GameMinMaxEnvTest(unittest.TestCase):
         self.env.close()
 
     def test_random_play_level_1_1(self):
-        self.play_randomly(0, 1, 27)
+        self.play_randomly(0, 1, 56)
 
     def test_random_play_level_1_2(self):
-        self.play_randomly(3, 1, 38)
+        self.play_randomly(3, 1, 77)
 
     def test_random_play_level_2_1(self):
-        self.play_randomly(0, 2, 40)
+        self.play_randomly(0, 2, 55)
 
     def test_random_play_level_2_2(self):
-        self.play_randomly(2, 2, 45)
+        self.play_randomly(2, 2, 73)
 
     def test_random_play_level_3_1(self):
-        self.play_randomly(0, 3, 61)
+        self.play_randomly(0, 3, 19, [0, -101])
 
     def test_random_play_level_3_2(self):
-        self.play_randomly(3, 3, 43)
+        self.play_randomly(3, 3, 48)
 
     def test_history_table_printing(self):
-        self.play_randomly(0, 1, 27)
+        self.play_randomly(0, 1, 56)
         with captured_output() as (out, err):
             self.env._opponent.print_history_table()
         as_str = self.env._opponent.get_history_table()
         as_out = out.getvalue().rstrip()
         self.assertEqual(as_out, as_str)
 
-    def play_randomly(self, seed, depth_limit, final_round):
+    def test_search_stats_info(self):
+        self.env.settings['depth_limit'] = 2
+        self.env.reset()
+        self.env.seed(0)
+        _, _, _, info = self.env.step(self.env.available_actions[0])
+        self.assertNotIn('search_stats', info)
+        _, _, _, info = self.env.step(self.env.available_actions[0])
+        self.assertIs(self.env._opponent.last_search_stats, info['search_stats'])
+        self.assertEqual(2, info['search_stats'].depth)
+
+    def test_search_pool_shared_between_matches(self):
+        env = RPS3GameMinMaxEnv(depth_limit=2, search_workers=2, exact_chance=True)
+        try:
+            env.reset()
+            pool = env._search_pool
+            self.assertIsNotNone(pool)
+            env.step(env.available_actions[0])
+            env.step(env.available_actions[0])
+            env.reset()
+            self.assertIs(pool, env._search_pool)
+            self.assertIs(pool, env._opponent.search_pool)
+        finally:
+            env.close()
+        self.assertIsNone(env._search_pool)
+
+    def play_randomly(self, seed, depth_limit, final_round, final_reward=(0, -100)):
         self.env.settings['depth_limit'] = depth_limit
         self.env.reset()
         self.env.seed(seed)
+        rng = random.Random(seed)
         done = False
         reward, info = None, None
         total_reward = 0
         while not done:
             logger.debug(self.env.render(mode='ansi'))
-            action = random.choice(self.env.available_actions)
+            action = rng.choice(self.env.available_actions)
             logger.debug('Taking action: %s', action)
             obs, reward, done, info = self.env.step(action)
             logger.debug('Got reward: %s', reward)
@@ -463,6 +644,6 @@ class RPS3GameMinMaxEnvTest(unittest.TestCase):
             total_reward += sum(reward)
         logger.debug(self.env.render(mode='ansi'))
         logger.debug('Game over. Total reward: %d', total_reward)
-        self.assertEqual([0, -100], reward)
+        self.assertEqual(list(final_reward), reward)
         self.assertTrue(done)
         self.assertEqual(final_round, info['round'])
@@ -0,0 +1,81 @@
+"""
+   Copyright 2019 Islam Elnabarawy
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+import unittest
+
+import numpy as np
+
+from rps3env import seeding, topology
+from rps3env.envs import RPS3SubprocVectorEnv, RPS3VectorEnv
+from rps3env.tests.rps3_vector_test import random_actions
+
+__author__ = 'Islam Elnabarawy'
+
+
+class RPS3SubprocVectorEnvTest(unittest.TestCase):
+    def setUp(self):
+        self.env = RPS3SubprocVectorEnv(5, num_workers=2, env_class=RPS3VectorEnv)
+        self.env.seed(0)
+
+    def tearDown(self):
+        self.env.close()
+
+    def test_reset(self):
+        obs = self.env.reset()
+        self.assertEqual(2, self.env.num_workers)
+        self.assertEqual((5, topology.NUM_CELLS), obs.shape)
+        self.assertEqual((5, topology.NUM_EDGES), self.env.action_mask().shape)
+        for row in obs:
+            self.assertListEqual([4] * 9, row[9:18].tolist())
+
+    def test_matches_in_process_env(self):
+        # every worker runs its slice with its own seed derived from the given one, so the same can be done in-process
+        expected = [RPS3VectorEnv(2), RPS3VectorEnv(3)]
+        for env, seed in zip(expected, seeding.fork_seeds(0, 2)):
+            env.seed(seed)
+        obs = self.env.reset()
+        self.assertTrue(np.array_equal(np.concatenate([env.reset() for env in expected]), obs))
+        rng = np.random.default_rng(0)
+        for _ in range(100):
+            actions = random_actions(self.env, rng)
+            obs, rewards, dones, infos = self.env.step(actions)
+            results = [expected[0].step(actions[:2]), expected[1].step(actions[2:])]
+            self.assertTrue(np.array_equal(np.concatenate([r[0] for r in results]), obs))
+            self.assertTrue(np.array_equal(np.concatenate([r[1] for r in results]), rewards))
+            self.assertTrue(np.array_equal(np.concatenate([r[2] for r in results]), dones))
+            self.assertTrue(np.array_equal(np.concatenate([env.action_mask() for env in expected]),
+                                           self.env.action_mask()))
+            self.assertListEqual([info['round'] for r in results for info in r[3]], [info['round'] for info in infos])
+
+    def test_step_async(self):
+        self.env.reset()
+        self.env.step_async(random_actions(self.env, np.random.default_rng(0)))
+        self.assertRaises(AssertionError, lambda: self.env.reset())
+        obs, rewards, dones, infos = self.env.step_wait()
+        self.assertEqual(5, len(infos))
+        self.assertTrue(all(info['round'] == 1 for info in infos))
+        self.assertRaises(AssertionError, lambda: self.env.step_wait())
+
+    def test_minmax_workers(self):
+        env = RPS3SubprocVectorEnv(2, num_workers=2, depth_limit=1)
+        try:
+            env.seed(0)
+            env.reset()
+            rng = np.random.default_rng(0)
+            for _ in range(5):
+                obs, rewards, dones, infos = env.step(random_actions(env, rng))
+            self.assertEqual((2, topology.NUM_CELLS), obs.shape)
+        finally:
+            env.close()
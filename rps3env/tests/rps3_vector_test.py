@@ -0,0 +1,165 @@
+"""
+   Copyright 2019 Islam Elnabarawy
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+import unittest
+
+import gym
+import numpy as np
+
+import rps3env
+from rps3env import topology
+from rps3env.classes import PlayerColor
+from rps3env.envs import RPS3VectorEnv, RPS3VectorMinMaxEnv
+
+__author__ = 'Islam Elnabarawy'
+
+
+def get_expected_observation(match):
+    obs = []
+    for p in match.board:
+        if p is None:
+            obs.append(0)
+        elif p.color == PlayerColor.Blue:
+            obs.append(p.piece_type.value)
+        else:
+            obs.append(4 + p.piece_type.value if p.revealed else 4)
+    return obs
+
+
+def get_expected_mask(match):
+    color, moves = match.get_possible_moves()
+    mask = [False] * topology.NUM_EDGES
+    for move in moves:
+        mask[topology.EDGE_INDEX[move]] = True
+    return mask
+
+
+def random_actions(env, rng):
+    return (rng.random(env.action_mask().shape) * env.action_mask()).argmax(axis=1)
+
+
+class RPS3VectorEnvTest(unittest.TestCase):
+    def setUp(self):
+        self.env = RPS3VectorEnv(8)
+        self.env.seed(0)
+
+    def assert_consistent(self):
+        for i, match in enumerate(self.env._matches):
+            self.assertListEqual(get_expected_observation(match), self.env._obs[i].tolist())
+            self.assertListEqual(get_expected_mask(match), self.env.action_mask()[i].tolist())
+
+    def test_reset(self):
+        obs = self.env.reset()
+        self.assertEqual((8, topology.NUM_CELLS), obs.shape)
+        self.assertEqual(np.int8, obs.dtype)
+        self.assertEqual((8, topology.NUM_EDGES), self.env.action_mask().shape)
+        self.assertTrue(self.env.observation_space.contains(obs))
+        for row in obs:
+            self.assertListEqual([4] * 9, row[9:18].tolist())
+            self.assertListEqual([1, 2, 3], sorted(set(row[:9].tolist())))
+        self.assert_consistent()
+
+    def test_fixed_layout(self):
+        env = RPS3VectorEnv(2, layout=[1, 2, 3] * 3)
+        obs = env.reset()
+        self.assertListEqual([[1, 2, 3] * 3] * 2, obs[:, :9].tolist())
+
+    def test_step(self):
+        self.env.reset()
+        rng = np.random.default_rng(0)
+        finished = 0
+        for _ in range(200):
+            obs, rewards, dones, infos = self.env.step(random_actions(self.env, rng))
+            self.assertEqual((8,), rewards.shape)
+            self.assertEqual((8,), dones.shape)
+            self.assertEqual(8, len(infos))
+            self.assert_consistent()
+            for i in np.flatnonzero(dones):
+                finished += 1
+                self.assertIn(abs(rewards[i]), (99, 100, 101))
+                self.assertEqual((topology.NUM_CELLS,), infos[i]['terminal_observation'].shape)
+                self.assertEqual(0, self.env._rounds[i])
+                self.assertListEqual([4] * 9, obs[i, 9:18].tolist())
+            for i in np.flatnonzero(~dones):
+                self.assertEqual(infos[i]['round'], self.env._rounds[i])
+                self.assertNotIn('terminal_observation', infos[i])
+        self.assertGreater(finished, 0)
+
+    def test_illegal_move(self):
+        self.env.reset()
+        actions = [topology.EDGE_INDEX[(0, 1)]] * 8
+        self.assertRaises(AssertionError, lambda: self.env.step(actions))
+
+    def test_uninitialized(self):
+        self.assertRaises(ValueError, lambda: self.env.step([0] * 8))
+
+    def test_seed(self):
+        def play(seed):
+            env = RPS3VectorEnv(4)
+            env.seed(seed)
+            history = [env.reset().copy()]
+            rng = np.random.default_rng(seed)
+            for _ in range(50):
+                obs, rewards, dones, infos = env.step(random_actions(env, rng))
+                history.append((obs.copy(), rewards.copy()))
+            return history
+
+        first, second, other = play(1), play(1), play(2)
+        self.assertTrue(all(np.array_equal(a[0], b[0]) for a, b in zip(first[1:], second[1:])))
+        self.assertTrue(all(np.array_equal(a[1], b[1]) for a, b in zip(first[1:], second[1:])))
+        self.assertFalse(all(np.array_equal(a[0], b[0]) for a, b in zip(first[1:], other[1:])))
+
+    def test_gym_make(self):
+        env = gym.make('RPS3VectorGame-v0')
+        self.assertEqual(16, env.unwrapped.num_envs)
+        self.assertEqual((16, topology.NUM_CELLS), env.reset().shape)
+
+
+class RPS3VectorMinMaxEnvTest(unittest.TestCase):
+    def test_step(self):
+        env = RPS3VectorMinMaxEnv(2, depth_limit=1)
+        env.seed(0)
+        env.reset()
+        self.assertEqual({'depth_limit': 1}, env.settings)
+        rng = np.random.default_rng(0)
+        for _ in range(20):
+            obs, rewards, dones, infos = env.step(random_actions(env, rng))
+            for i, match in enumerate(env._matches):
+                self.assertListEqual(get_expected_observation(match), obs[i].tolist())
+                self.assertListEqual(get_expected_mask(match), env.action_mask()[i].tolist())
+                if dones[i]:
+                    continue
+                self.assertIs(env._opponents[i].last_search_stats, infos[i]['search_stats'])
+                # the opponent plays Red, so its own pieces are the match's Red pieces
+                board = env._opponents[i].board
+                for index, p in enumerate(match.board):
+                    ring, k = topology.SQUARES[index]
+                    expected = '0' if p is None else 'P' if p.color == PlayerColor.Red else 'O'
+                    self.assertEqual(expected, board[ring][k][0])
+
+    def test_search_pool_shared_between_matches(self):
+        env = RPS3VectorMinMaxEnv(2, depth_limit=2, search_workers=2, exact_chance=True)
+        try:
+            env.seed(0)
+            env.reset()
+            pool = env._search_pool
+            self.assertIsNotNone(pool)
+            self.assertTrue(all(opponent.search_pool is pool for opponent in env._opponents))
+            env.step(random_actions(env, np.random.default_rng(0)))
+            env.reset()
+            self.assertIs(pool, env._search_pool)
+        finally:
+            env.close()
+        self.assertIsNone(env._search_pool)
\ No newline at end of file
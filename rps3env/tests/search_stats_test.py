@@ -0,0 +1,82 @@
+"""
+   Copyright 2019 Islam Elnabarawy
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+import unittest
+
+from rps3env.opponents.search_stats import SearchStats, SearchStatsAggregator
+
+__author__ = 'Islam Elnabarawy'
+
+
+def make_stats(depth=2, iteration_nodes=(10, 40), time_ms=5.0, budget_exhausted=False, tt_hits=1, history_hits=3):
+    return SearchStats(
+        depth=depth, nodes=sum(iteration_nodes), time_ms=time_ms, budget_exhausted=budget_exhausted,
+        iteration_nodes=iteration_nodes, iteration_time_ms=(1.0,) * len(iteration_nodes), cutoffs=7,
+        chance_prunes=2, tt_probes=4, tt_hits=tt_hits, history_probes=6, history_hits=history_hits
+    )
+
+
+class TestSearchStats(unittest.TestCase):
+
+    def test_rates(self):
+        stats = make_stats()
+        self.assertEqual(0.25, stats.tt_hit_rate)
+        self.assertEqual(0.5, stats.history_hit_rate)
+        self.assertEqual(4.0, stats.branching_factor)
+
+    def test_noProbes(self):
+        stats = make_stats(iteration_nodes=(10,))._replace(tt_probes=0, tt_hits=0)
+        self.assertEqual(0.0, stats.tt_hit_rate)
+        self.assertEqual(0.0, stats.branching_factor)
+
+    def test_asDict(self):
+        result = make_stats().as_dict()
+        self.assertEqual(50, result['nodes'])
+        self.assertEqual((10, 40), result['iteration_nodes'])
+        self.assertEqual(4.0, result['branching_factor'])
+
+
+class TestSearchStatsAggregator(unittest.TestCase):
+
+    def test_empty(self):
+        self.assertEqual({'moves': 0}, SearchStatsAggregator().summary())
+
+    def test_summary(self):
+        aggregator = SearchStatsAggregator()
+        aggregator.add(make_stats(time_ms=5.0))
+        aggregator.add(make_stats(depth=1, iteration_nodes=(30,), time_ms=15.0, budget_exhausted=True, tt_hits=3))
+        self.assertEqual(2, len(aggregator))
+        summary = aggregator.summary()
+        self.assertEqual(2, summary['moves'])
+        self.assertEqual(80, summary['nodes'])
+        self.assertEqual(40, summary['nodes_per_move'])
+        self.assertEqual(4000, summary['nodes_per_second'])
+        self.assertEqual(1.5, summary['mean_depth'])
+        self.assertEqual(1, summary['min_depth'])
+        self.assertEqual(1, summary['budget_exhausted'])
+        self.assertEqual(10.0, summary['mean_time_ms'])
+        self.assertEqual(15.0, summary['p95_time_ms'])
+        self.assertEqual(15.0, summary['max_time_ms'])
+        self.assertEqual(14, summary['cutoffs'])
+        self.assertEqual(4, summary['chance_prunes'])
+        self.assertEqual(0.5, summary['tt_hit_rate'])
+        self.assertEqual(0.5, summary['history_hit_rate'])
+        self.assertEqual(4.0, summary['branching_factor'])
+
+    def test_clear(self):
+        aggregator = SearchStatsAggregator()
+        aggregator.add(make_stats())
+        aggregator.clear()
+        self.assertEqual(0, len(aggregator))
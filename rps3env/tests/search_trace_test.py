@@ -0,0 +1,36 @@
+"""
+   Copyright 2019 Islam Elnabarawy
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+import logging
+import unittest
+
+from rps3env.opponents.search_trace import CUTOFF, NODE, LoggingSink, SearchEvent
+
+__author__ = 'Islam Elnabarawy'
+
+
+class TestLoggingSink(unittest.TestCase):
+
+    def test_logsEvents(self):
+        log = logging.getLogger('rps3env.tests.search_trace_test')
+        sink = LoggingSink(log)
+        with self.assertLogs(log, logging.DEBUG) as logs:
+            sink(SearchEvent(NODE, 0, 2, True, -1000, 1000, None, None))
+            sink(SearchEvent(CUTOFF, 2, 1, False, 5, 7, (('O', 0), ('O', 17)), 4))
+        self.assertEqual([
+            'node max @ depth: 2, alpha: -1000, beta: 1000, move: None, value: None',
+            '\t\tcutoff min @ depth: 1, alpha: 5, beta: 7, move: O0:O17, value: 4',
+        ], [record.getMessage() for record in logs.records])
+
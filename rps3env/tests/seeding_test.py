@@ -0,0 +1,33 @@
+"""
+   Copyright 2019 Islam Elnabarawy
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+import unittest
+
+from rps3env import seeding
+
+__author__ = 'Islam Elnabarawy'
+
+
+class SeedingTest(unittest.TestCase):
+    def test_create_seed(self):
+        self.assertEqual(42, seeding.create_seed(42))
+        self.assertNotEqual(seeding.create_seed(), seeding.create_seed())
+
+    def test_fork_seeds(self):
+        seeds = seeding.fork_seeds(42, 8)
+        self.assertEqual(8, len(set(seeds)))
+        self.assertEqual(seeds, seeding.fork_seeds(42, 8))
+        self.assertEqual(seeds[:4], seeding.fork_seeds(42, 4))
+        self.assertNotEqual(seeds, seeding.fork_seeds(43, 8))
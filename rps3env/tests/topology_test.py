@@ -0,0 +1,76 @@
+"""
+   Copyright 2019 Islam Elnabarawy
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+import unittest
+
+from rps3env import topology
+
+__author__ = 'Islam Elnabarawy'
+
+
+class TopologyTest(unittest.TestCase):
+
+    def test_neighbors(self):
+        self.assertEqual((1, 17, 18), topology.NEIGHBORS[0])
+        self.assertEqual((19, 26, 0, 1, 27), topology.NEIGHBORS[18])
+        self.assertEqual(topology.INNER_CELLS, topology.NEIGHBORS[27])
+        for i, neighbors in enumerate(topology.NEIGHBORS):
+            for x in neighbors:
+                self.assertIn(i, topology.NEIGHBORS[x])
+            self.assertEqual(sum(1 << x for x in neighbors), topology.NEIGHBOR_MASKS[i])
+
+    def test_square_neighbors(self):
+        self.assertEqual((('O', 5), ('O', 3), ('I', 2)), topology.SQUARE_NEIGHBORS['O'][4])
+        self.assertEqual((('I', 3), ('I', 1), ('O', 4), ('O', 5), ('C', 0)), topology.SQUARE_NEIGHBORS['I'][2])
+        self.assertEqual(tuple(('I', i) for i in range(9)), topology.SQUARE_NEIGHBORS['C'][0])
+
+    def test_labels(self):
+        self.assertEqual('O0', topology.LABELS[0])
+        self.assertEqual('O17', topology.LABELS[17])
+        self.assertEqual('I0', topology.LABELS[18])
+        self.assertEqual('I8', topology.LABELS[26])
+        self.assertEqual('C0', topology.LABELS[27])
+        for i in range(topology.NUM_CELLS):
+            self.assertEqual(i, topology.LABEL_INDEX[topology.LABELS[i]])
+            self.assertEqual(i, topology.SQUARE_INDEX[topology.SQUARES[i]])
+
+    def test_edges(self):
+        self.assertEqual(108, topology.NUM_EDGES)
+        for k, edge in enumerate(topology.EDGES):
+            self.assertEqual(k, topology.EDGE_INDEX[edge])
+            self.assertIn(k, topology.EDGES_FROM[edge[0]])
+            self.assertIn(k, topology.EDGES_TO[edge[1]])
+        self.assertEqual(topology.NUM_EDGES, sum(len(e) for e in topology.EDGES_FROM))
+        self.assertEqual(topology.NUM_EDGES, sum(len(e) for e in topology.EDGES_TO))
+
+    def test_distance_to_center(self):
+        distance = {topology.CENTER_CELL: 0}
+        frontier = [topology.CENTER_CELL]
+        steps = 0
+        while frontier:
+            steps += 1
+            frontier = {x for i in frontier for x in topology.NEIGHBORS[i] if x not in distance}
+            distance.update((x, steps) for x in frontier)
+        self.assertEqual(tuple(distance[i] for i in range(topology.NUM_CELLS)), topology.DISTANCE_TO_CENTER)
+
+    def test_symmetries(self):
+        self.assertEqual(18, len(set(topology.SYMMETRIES)))
+        self.assertEqual(tuple(range(topology.NUM_CELLS)), topology.ROTATIONS[0])
+        for permutation in topology.SYMMETRIES:
+            self.assertEqual(list(range(topology.NUM_CELLS)), sorted(permutation))
+            for i in range(topology.NUM_CELLS):
+                self.assertEqual(topology.RING_OF[i], topology.RING_OF[permutation[i]])
+            for a, b in topology.EDGES:
+                self.assertIn((permutation[a], permutation[b]), topology.EDGE_INDEX)
@@ -0,0 +1,66 @@
+"""
+   Copyright 2019 Islam Elnabarawy
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+import unittest
+
+from rps3env.opponents.transposition_table import EXACT, LOWER, UPPER, TranspositionTable
+
+__author__ = 'Islam Elnabarawy'
+
+
+class TranspositionTableTest(unittest.TestCase):
+
+    def test_size(self):
+        self.assertEqual(1 << 16, len(TranspositionTable()))
+        self.assertEqual(8, len(TranspositionTable(10)))
+        self.assertEqual(8, len(TranspositionTable(8)))
+        self.assertEqual(2, len(TranspositionTable(3)))
+        self.assertEqual(2, len(TranspositionTable(1)))
+
+    def test_storeProbe(self):
+        table = TranspositionTable(8)
+        self.assertIsNone(table.probe(5))
+        table.store(5, 2, EXACT, 3.5, (('O', 0), ('O', 1)))
+        entry = table.probe(5)
+        self.assertEqual((5, 2, EXACT, 3.5, (('O', 0), ('O', 1))), entry[:5])
+        self.assertEqual(2, table.probes)
+        self.assertEqual(1, table.hits)
+
+    def test_depthPreferred(self):
+        table = TranspositionTable(2)
+        table.store(1, 3, LOWER, 1, None)
+        table.store(2, 1, UPPER, 2, None)
+        table.store(3, 2, EXACT, 3, None)
+        # the deeper entry stays, the shallower ones take turns in the other slot
+        self.assertEqual(3, table.probe(1).depth)
+        self.assertIsNone(table.probe(2))
+        self.assertEqual(2, table.probe(3).depth)
+
+    def test_newSearchReplacesOldEntries(self):
+        table = TranspositionTable(2)
+        table.store(1, 3, EXACT, 1, None)
+        table.new_search()
+        table.store(2, 1, EXACT, 2, None)
+        table.store(3, 0, EXACT, 3, None)
+        self.assertIsNone(table.probe(1))
+        self.assertIsNotNone(table.probe(2))
+        self.assertIsNotNone(table.probe(3))
+
+    def test_clear(self):
+        table = TranspositionTable(8)
+        table.store(1, 1, EXACT, 1, None)
+        table.clear()
+        self.assertIsNone(table.probe(1))
+        self.assertEqual(8, len(table))
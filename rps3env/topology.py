@@ -0,0 +1,80 @@
+"""
+   Copyright 2019 Islam Elnabarawy
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+__author__ = 'Islam Elnabarawy'
+
+# Board topology tables, computed once at import time.
+# Cells are numbered 0-27 the way the environment does it: 0-17 are the outer ring, 18-26 are the inner ring,
+# and 27 is the center. The opponents label the same cells by ring, as 'O0'-'O17', 'I0'-'I8' and 'C0'.
+
+NUM_CELLS = 28
+OUTER_CELLS = tuple(range(0, 18))
+INNER_CELLS = tuple(range(18, 27))
+CENTER_CELL = 27
+CENTER_BIT = 1 << CENTER_CELL
+
+RING_OFFSETS = {'O': 0, 'I': 18, 'C': 27}
+RING_OF = ('O',) * 18 + ('I',) * 9 + ('C',)
+DISTANCE_TO_CENTER = (2,) * 18 + (1,) * 9 + (0,)
+
+# cell index <-> (ring, index within ring) and cell index <-> label
+SQUARES = tuple((RING_OF[i], i - RING_OFFSETS[RING_OF[i]]) for i in range(NUM_CELLS))
+SQUARE_INDEX = {square: i for i, square in enumerate(SQUARES)}
+LABELS = tuple('%s%d' % square for square in SQUARES)
+LABEL_INDEX = {label: i for i, label in enumerate(LABELS)}
+
+
+def _get_neighbors(index):
+    if index < 18:
+        return (index + 1) % 18, (index + 17) % 18, 18 + index // 2
+    index -= 18
+    if index < 9:
+        return 18 + (index + 1) % 9, 18 + (index + 8) % 9, index * 2, index * 2 + 1, 27
+    return tuple(INNER_CELLS)
+
+
+NEIGHBORS = tuple(_get_neighbors(i) for i in range(NUM_CELLS))
+NEIGHBOR_MASKS = tuple(sum(1 << x for x in n) for n in NEIGHBORS)
+
+# the same adjacency, for boards indexed as board[ring][index]
+SQUARE_NEIGHBORS = {
+    ring: tuple(tuple(SQUARES[x] for x in NEIGHBORS[RING_OFFSETS[ring] + i]) for i in range(size))
+    for ring, size in (('O', 18), ('I', 9), ('C', 1))
+}
+
+# every directed (from, to) edge, and the position of each edge in that list
+EDGES = tuple((i, x) for i in range(NUM_CELLS) for x in NEIGHBORS[i])
+NUM_EDGES = len(EDGES)
+EDGE_INDEX = {edge: k for k, edge in enumerate(EDGES)}
+EDGES_FROM = tuple(tuple(k for k, (a, b) in enumerate(EDGES) if a == i) for i in range(NUM_CELLS))
+EDGES_TO = tuple(tuple(k for k, (a, b) in enumerate(EDGES) if b == i) for i in range(NUM_CELLS))
+
+
+def _rotation(steps):
+    return tuple((i + 2 * steps) % 18 for i in OUTER_CELLS) + \
+           tuple(18 + (i - 18 + steps) % 9 for i in INNER_CELLS) + (CENTER_CELL,)
+
+
+def _reflection(steps):
+    rotation = _rotation(steps)
+    return tuple(rotation[17 - i] for i in OUTER_CELLS) + \
+           tuple(rotation[18 + 26 - i] for i in INNER_CELLS) + (CENTER_CELL,)
+
+
+# board symmetries as permutations, where permutation[i] is the cell that cell i is mapped to
+ROTATIONS = tuple(_rotation(k) for k in range(9))
+REFLECTIONS = tuple(_reflection(k) for k in range(9))
+SYMMETRIES = ROTATIONS + REFLECTIONS
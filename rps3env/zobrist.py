@@ -0,0 +1,43 @@
+"""
+   Copyright 2019 Islam Elnabarawy
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+import random
+
+__author__ = 'Islam Elnabarawy'
+
+# the keys come from a fixed seed so that hashes are the same across runs and processes
+_rng = random.Random(0x52505333)
+
+
+def _key():
+    return _rng.getrandbits(64)
+
+
+# toggled on every move, so the same board with a different player to move hashes differently
+SIDE_TO_MOVE = _key()
+
+# Match pieces, indexed as [cell][color value][piece type value][revealed]
+MATCH_PIECES = tuple(
+    tuple(tuple((_key(), _key()) for _ in range(4)) for _ in range(2)) for _ in range(28)
+)
+
+# MatchState pieces, indexed as [piece string][cell]
+STATE_PIECES = {
+    code: tuple(_key() for _ in range(28))
+    for code in ('PR', 'PP', 'PS', 'PR!', 'PP!', 'PS!', 'OU', 'OR', 'OP', 'OS')
+}
+
+# MatchState captures, indexed as [piece type index][number captured]
+STATE_CAPTURES = tuple(tuple(_key() for _ in range(4)) for _ in range(3))